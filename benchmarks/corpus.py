@@ -0,0 +1,46 @@
+"""Realistic chat traffic shared by the benchmarks and the load generator"""
+
+# Single messages, roughly in the mix the agent sees: availability checks,
+# bookings with and without a time, quick actions, follow-ups and small talk
+MESSAGES = [
+    "check availability tomorrow",
+    "Check availability for today",
+    "what's free on friday?",
+    "When am I available next week?",
+    "are there any free slots on monday afternoon",
+    "show my availability for 2025-07-01",
+    "Any availability on 7/3/2025?",
+    "Book a meeting tomorrow at 3pm",
+    "schedule a call on thursday at 10:30 am for 30 minutes",
+    "book an appointment today at 14:30",
+    "Can you book a 45-minute meeting on wednesday at 4 p.m.?",
+    "schedule a 2 hour workshop next week",
+    "book tomorrow 9am",
+    "quick book",
+    "quickbook a slot for tomorrow",
+    "I need to schedule a meeting with the design team tomorrow",
+    "please book me in for 11am on tuesday",
+    "book the 3pm one",
+    "the 10:30 slot works",
+    "actually make it 1 hour",
+    "find a time with alice@example.com and bob@example.com tomorrow",
+    "when are priya@example.com and sam@example.com free on friday for 30 minutes",
+    "cancel my meeting tomorrow",
+    "delete the 3pm appointment",
+    "hi",
+    "hello, what can you do?",
+    "thanks!",
+    "Can you help me plan my week? I have a lot of calls and want to keep mornings clear",
+    "Book a 15 min sync on 2025-07-02 at 09:15",
+    "is 5pm today free",
+]
+
+# Multi-turn conversations: look, book something shown, look again
+TRANSCRIPTS = [
+    ["check availability tomorrow", "book tomorrow at 3pm", "check availability tomorrow"],
+    ["what's free on friday?", "book the 10:30 slot", "thanks!"],
+    ["hi", "Book a meeting tomorrow at 11am for 30 minutes", "check availability tomorrow"],
+    ["When am I available next week?", "schedule a call next week at 4pm", "what's free next week?"],
+    ["find a time with alice@example.com and bob@example.com tomorrow", "book tomorrow at 12pm"],
+    ["quick book", "check availability for today"],
+]
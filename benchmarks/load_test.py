@@ -0,0 +1,298 @@
+"""HTTP load generator that replays multi-turn chat transcripts against a running API.
+
+Sessions arrive as a Poisson process at --rate per second (open loop), or
+back to back on every worker when --rate is 0 (closed loop), for
+--duration seconds. Each session replays one transcript: chat turns go to
+/api/chat (or /api/chat/stream with --stream), and a "@book" step books one
+of the slots the previous reply offered through /api/book. Throughput,
+latency percentiles and histograms, and error rates are reported per endpoint.
+
+    CALENDAR_BACKEND=memory python src/main.py
+    python benchmarks/load_test.py --rate 5 --concurrency 32 --duration 60
+    python benchmarks/load_test.py --transcripts recorded.json --output load.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import TRANSCRIPTS
+
+BOOK_OFFERED = '@book'
+
+# Look, book one of the offered slots, look again
+DEFAULT_TRANSCRIPTS = [
+    ["check availability tomorrow", BOOK_OFFERED, "check availability tomorrow"],
+    ["what's free on friday?", BOOK_OFFERED, "what's free on friday?"],
+] + TRANSCRIPTS
+
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies = []
+        self.first_event = []
+        self.errors = {}
+        self.conflicts = 0
+
+    def record(self, seconds, error=None, first_event=None):
+        self.latencies.append(seconds * 1000)
+        if first_event is not None:
+            self.first_event.append(first_event * 1000)
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        total = len(latencies)
+        errors = sum(self.errors.values())
+
+        def percentile(values, fraction):
+            return round(values[min(len(values) - 1, int(fraction * len(values)))], 1) if values else None
+
+        histogram = []
+        previous = 0
+        for bound in HISTOGRAM_BOUNDS_MS:
+            count = sum(1 for latency in latencies if previous <= latency < bound)
+            histogram.append({'le_ms': bound if bound != float('inf') else None, 'count': count})
+            previous = bound
+        summary = {
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed else 0,
+            'error_rate': round(errors / total, 4) if total else 0,
+            'errors': self.errors,
+            'p50_ms': percentile(latencies, 0.50),
+            'p90_ms': percentile(latencies, 0.90),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': round(latencies[-1], 1) if latencies else None,
+            'histogram': histogram,
+        }
+        if self.conflicts:
+            summary['booking_conflicts'] = self.conflicts
+        if self.first_event:
+            summary['first_event_p50_ms'] = percentile(sorted(self.first_event), 0.50)
+            summary['first_event_p95_ms'] = percentile(sorted(self.first_event), 0.95)
+        return summary
+
+
+class LoadTest:
+    def __init__(self, base_url, transcripts, stream=False, timeout=30.0, think_time=0.0):
+        self.base_url = base_url.rstrip('/')
+        self.transcripts = transcripts
+        self.stream = stream
+        self.timeout = timeout
+        self.think_time = think_time
+        self.stats = {}
+        self.sessions_started = 0
+        self.sessions_completed = 0
+        self.start_delays = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.run_id = uuid.uuid4().hex[:8]
+
+    def _session(self):
+        # One keep-alive connection pool per worker thread
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = requests.Session()
+        return http
+
+    def _record(self, endpoint, seconds, error=None, first_event=None, conflict=False):
+        with self._lock:
+            stats = self.stats.setdefault(endpoint, EndpointStats())
+            stats.record(seconds, error, first_event)
+            if conflict:
+                stats.conflicts += 1
+
+    def _chat(self, session_id, message):
+        http = self._session()
+        endpoint = '/api/chat/stream' if self.stream else '/api/chat'
+        start = time.perf_counter()
+        try:
+            if self.stream:
+                return self._chat_stream(http, session_id, message, start)
+            response = http.post(f"{self.base_url}/api/chat", json={'message': message, 'session_id': session_id},
+                                 timeout=self.timeout)
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                self._record(endpoint, elapsed, f"http_{response.status_code}")
+                return None
+            data = response.json()
+            self._record(endpoint, elapsed, 'agent_error' if data.get('intent') == 'error' else None)
+            return data
+        except (requests.RequestException, ValueError) as e:
+            self._record(endpoint, time.perf_counter() - start, e.__class__.__name__)
+            return None
+
+    def _chat_stream(self, http, session_id, message, start):
+        first_event = None
+        done = None
+        with http.post(f"{self.base_url}/api/chat/stream", json={'message': message, 'session_id': session_id},
+                       timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                self._record('/api/chat/stream', time.perf_counter() - start, f"http_{response.status_code}")
+                return None
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if first_event is None and line:
+                    first_event = time.perf_counter() - start
+                if line.startswith('event: '):
+                    event = line[len('event: '):]
+                elif line.startswith('data: ') and event == 'done':
+                    done = json.loads(line[len('data: '):])
+        error = None if done is not None and done.get('intent') != 'error' else 'agent_error'
+        self._record('/api/chat/stream', time.perf_counter() - start, error, first_event)
+        return done
+
+    def _book(self, session_id, reply):
+        slots = (reply or {}).get('available_slots') or []
+        if not slots:
+            return
+        slot = random.choice(slots)
+        http = self._session()
+        start = time.perf_counter()
+        try:
+            response = http.post(f"{self.base_url}/api/book", json={
+                'datetime': slot['datetime'],
+                'duration': 30,
+                'title': 'Load test meeting',
+                'add_meet_link': False,
+                'session_id': session_id,
+                'slots_version': reply.get('slots_version'),
+            }, timeout=self.timeout)
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                self._record('/api/book', elapsed, f"http_{response.status_code}")
+                return
+            result = response.json()
+            conflict = bool(result.get('conflict'))
+            self._record('/api/book', elapsed, None if result.get('success') or conflict else 'booking_failed', conflict=conflict)
+        except requests.RequestException as e:
+            self._record('/api/book', time.perf_counter() - start, e.__class__.__name__)
+
+    def run_session(self, scheduled_at=None):
+        if scheduled_at is not None:
+            with self._lock:
+                self.start_delays.append((time.perf_counter() - scheduled_at) * 1000)
+        with self._lock:
+            self.sessions_started += 1
+            session_id = f"load-{self.run_id}-{self.sessions_started}"
+        reply = None
+        for step in random.choice(self.transcripts):
+            if step == BOOK_OFFERED:
+                self._book(session_id, reply)
+            else:
+                reply = self._chat(session_id, step)
+            if self.think_time:
+                time.sleep(random.expovariate(1 / self.think_time))
+        with self._lock:
+            self.sessions_completed += 1
+
+    def run(self, rate, concurrency, duration):
+        started = time.perf_counter()
+        deadline = started + duration
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as pool:
+            if rate > 0:
+                # Open loop: arrivals keep coming on schedule even when the server falls behind;
+                # start delay shows how long sessions waited for a free worker
+                next_arrival = started
+                while True:
+                    next_arrival += random.expovariate(rate)
+                    if next_arrival >= deadline:
+                        break
+                    time.sleep(max(0.0, next_arrival - time.perf_counter()))
+                    pool.submit(self.run_session, next_arrival)
+            else:
+                def worker():
+                    while time.perf_counter() < deadline:
+                        self.run_session()
+                for _ in range(concurrency):
+                    pool.submit(worker)
+        return time.perf_counter() - started
+
+
+def load_transcripts(path):
+    """Transcripts from a JSON file: a list of conversations, each a list of messages ("@book" books an offered slot)"""
+    with open(path) as f:
+        transcripts = json.load(f)
+    if not isinstance(transcripts, list) or not all(isinstance(turns, list) and turns for turns in transcripts):
+        raise ValueError("Transcript file must hold a list of non-empty message lists")
+    return transcripts
+
+
+def print_report(report):
+    print(f"\nSessions: {report['sessions_completed']}/{report['sessions_started']} completed in {report['elapsed_s']}s")
+    if report.get('start_delay_p95_ms') is not None:
+        print(f"Session start delay p50 {report['start_delay_p50_ms']}ms, p95 {report['start_delay_p95_ms']}ms")
+    for endpoint, summary in report['endpoints'].items():
+        print(f"\n{endpoint}: {summary['requests']} requests, {summary['throughput_rps']} req/s, "
+              f"{summary['error_rate'] * 100:.2f}% errors {summary['errors'] or ''}")
+        print(f"  p50 {summary['p50_ms']}ms  p90 {summary['p90_ms']}ms  p95 {summary['p95_ms']}ms  "
+              f"p99 {summary['p99_ms']}ms  max {summary['max_ms']}ms")
+        if 'first_event_p50_ms' in summary:
+            print(f"  first event p50 {summary['first_event_p50_ms']}ms  p95 {summary['first_event_p95_ms']}ms")
+        if summary.get('booking_conflicts'):
+            print(f"  booking conflicts: {summary['booking_conflicts']}")
+        largest = max((bucket['count'] for bucket in summary['histogram']), default=0) or 1
+        for bucket in summary['histogram']:
+            label = f"< {bucket['le_ms']}ms" if bucket['le_ms'] is not None else ">= 10000ms"
+            print(f"  {label:>10} {bucket['count']:>7} {'#' * round(40 * bucket['count'] / largest)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', default=os.getenv('LOAD_TEST_URL', 'http://localhost:8000'))
+    parser.add_argument('--rate', type=float, default=2.0, help='session arrivals per second (0 = closed loop)')
+    parser.add_argument('--concurrency', type=int, default=16, help='max sessions in flight')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to generate load for')
+    parser.add_argument('--transcripts', help='JSON file of recorded transcripts (default: built-in synthetic ones)')
+    parser.add_argument('--stream', action='store_true', help='use /api/chat/stream and report time to first event')
+    parser.add_argument('--think-time', type=float, default=0.0, help='mean pause between turns, seconds')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout, seconds')
+    parser.add_argument('--seed', type=int, help='seed transcript choice and arrivals for repeatable runs')
+    parser.add_argument('--output', help='write the report as JSON here')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    transcripts = load_transcripts(args.transcripts) if args.transcripts else DEFAULT_TRANSCRIPTS
+
+    test = LoadTest(args.url, transcripts, stream=args.stream, timeout=args.timeout, think_time=args.think_time)
+    mode = f"{args.rate}/s Poisson arrivals" if args.rate > 0 else "closed loop"
+    print(f"Replaying {len(transcripts)} transcripts against {args.url}: {mode}, "
+          f"concurrency {args.concurrency}, {args.duration}s")
+    elapsed = test.run(args.rate, args.concurrency, args.duration)
+
+    delays = sorted(test.start_delays)
+    report = {
+        'url': args.url,
+        'rate': args.rate,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'stream': args.stream,
+        'elapsed_s': round(elapsed, 2),
+        'sessions_started': test.sessions_started,
+        'sessions_completed': test.sessions_completed,
+        'start_delay_p50_ms': round(delays[len(delays) // 2], 1) if delays else None,
+        'start_delay_p95_ms': round(delays[min(len(delays) - 1, int(0.95 * len(delays)))], 1) if delays else None,
+        'endpoints': {endpoint: stats.summary(elapsed) for endpoint, stats in sorted(test.stats.items())},
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""Benchmarks for the scheduling hot paths.
+
+Measures slot computation at several event densities and slot steps, the
+agent's message parsers, response formatting and full process_message
+runs, all against the in-memory calendar so nothing touches Google.
+Results (p50/p95/p99 latency and peak traced memory per operation) are
+written as JSON and compared against a stored baseline.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Never reach Google from a benchmark, and keep fetched windows warm for the whole run
+os.environ['CALENDAR_BACKEND'] = 'memory'
+os.environ.setdefault('EVENT_CACHE_TTL_SECONDS', '3600')
+
+from corpus import MESSAGES, TRANSCRIPTS
+from services.calendar_service import CalendarService
+from services.event_cache import EventWindowCache
+from services.fake_calendar import FakeCalendarBackend, FakeCalendarClient
+from services.langgraph_service import LangGraphSchedulingAgent
+from services.message_parser import _parse_normalized
+from services.request_executor import RequestExecutor
+from services import response_formatter
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def make_service(events_per_day: float, latency_ms: float = 0) -> CalendarService:
+    """CalendarService on a seeded fake calendar, without client-side rate limiting"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = FakeCalendarClient(FakeCalendarBackend(events_per_day=events_per_day, latency_ms=latency_ms))
+    return CalendarService(client=client, event_cache=EventWindowCache(),
+                           executor=RequestExecutor(qps=1e9, burst=1e9))
+
+
+def next_weekday(days_ahead: int = 1) -> str:
+    day = datetime.now().date() + timedelta(days=days_ahead)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day.isoformat()
+
+
+def measure(func, iterations: int, warmup: int, alloc_iterations: int) -> dict:
+    """Latency percentiles over ``iterations`` calls plus peak traced memory per call"""
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for _ in range(warmup):
+            func()
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            func()
+            samples.append(time.perf_counter_ns() - start)
+            sink.seek(0)
+            sink.truncate()
+
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(alloc_iterations):
+                tracemalloc.reset_peak()
+                baseline, _peak = tracemalloc.get_traced_memory()
+                func()
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+                sink.seek(0)
+                sink.truncate()
+        finally:
+            tracemalloc.stop()
+
+    samples.sort()
+    micros = [sample / 1000 for sample in samples]
+
+    def percentile(fraction):
+        return round(micros[min(len(micros) - 1, int(fraction * len(micros)))], 2)
+
+    return {
+        'iterations': iterations,
+        'p50_us': percentile(0.50),
+        'p95_us': percentile(0.95),
+        'p99_us': percentile(0.99),
+        'mean_us': round(statistics.fmean(micros), 2),
+        'peak_kib': round(statistics.median(peaks) / 1024, 2) if peaks else None,
+    }
+
+
+def slot_benchmarks():
+    """get_free_time_slots over a warm cache: the interval sweep and slot formatting"""
+    date = next_weekday()
+    for density in (0, 4, 12, 24):
+        service = make_service(density)
+        for step in (30, 15, 5):
+            def run(service=service, step=step):
+                service.slot_step_minutes = step
+                service.get_free_time_slots(date, 30)
+            yield f"slots[density={density},step={step}]", run
+
+
+def parser_benchmarks():
+    agent = LangGraphSchedulingAgent.__new__(LangGraphSchedulingAgent)
+
+    def parse_all():
+        for message in MESSAGES:
+            agent._extract_date(message)
+            agent._extract_time(message)
+            agent._extract_duration(message)
+
+    def parse_all_cold():
+        _parse_normalized.cache_clear()
+        parse_all()
+
+    yield "parse.corpus", parse_all
+    yield "parse.corpus_cold", parse_all_cold
+
+
+def format_benchmarks():
+    service = make_service(4)
+    date = next_weekday()
+    with contextlib.redirect_stdout(io.StringIO()):
+        slots = service.get_free_time_slots(date, 30)
+    agent = LangGraphSchedulingAgent.__new__(LangGraphSchedulingAgent)
+    agent.max_messages = 20
+    states = {
+        'availability': {'intent': 'check_availability', 'date': date, 'time': None},
+        'booking_slots': {'intent': 'book_appointment', 'date': date, 'time': '15:00'},
+        'confirmed': {'intent': 'book_appointment', 'date': date, 'time': '15:00', 'booking_confirmed': True,
+                      'booking_details': {'date': date, 'time': '15:00', 'duration': 30, 'title': 'Meeting',
+                                          'event_link': 'https://calendar.example.invalid/event'}},
+    }
+    for name, fields in states.items():
+        def render(fields=fields):
+            state = {'messages': [], 'available_slots': slots, 'booking_confirmed': False,
+                     'booking_details': {}, **fields}
+            agent._generate_response_node(state)
+        yield f"format.{name}", render
+
+    def render_cold():
+        for cached in (response_formatter._render_slots, response_formatter._render_booking,
+                       response_formatter._render_no_slots):
+            cached.cache_clear()
+        agent._generate_response_node({'messages': [], 'available_slots': slots, 'booking_confirmed': False,
+                                       'booking_details': {}, **states['availability']})
+    yield "format.availability_cold", render_cold
+
+
+def chat_benchmarks(latency_ms: float):
+    """Whole transcripts through process_message, a fresh session per run"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = LangGraphSchedulingAgent(calendar_service=make_service(4, latency_ms))
+    counter = iter(range(10 ** 9))
+
+    for index, transcript in enumerate(TRANSCRIPTS):
+        def converse(transcript=transcript):
+            session_id = f"bench-{next(counter)}"
+            for message in transcript:
+                agent.process_message(message, session_id)
+        yield f"chat.transcript{index}", converse
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Names whose p50 or p95 grew by more than ``threshold`` relative to the baseline"""
+    regressions = []
+    print(f"\n{'benchmark':<40}{'p50 us':>12}{'base':>12}{'ratio':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<40}{current['p50_us']:>12.1f}{'-':>12}{'new':>8}")
+            continue
+        ratio = current['p50_us'] / previous['p50_us'] if previous['p50_us'] else 1.0
+        tail_ratio = current['p95_us'] / previous['p95_us'] if previous['p95_us'] else 1.0
+        regressed = ratio > threshold or tail_ratio > threshold
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<40}{current['p50_us']:>12.1f}{previous['p50_us']:>12.1f}{ratio:>8.2f}{flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', help='compare against this results file')
+    parser.add_argument('--save-baseline', action='store_true', help=f'write results to {DEFAULT_BASELINE}')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed slowdown ratio (default 1.25)')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--quick', action='store_true', help='fewer iterations, for smoke runs')
+    parser.add_argument('--fake-latency-ms', type=float, default=0, help='calendar latency for chat runs')
+    args = parser.parse_args()
+
+    iterations, warmup, alloc_iterations = (30, 3, 3) if args.quick else (300, 20, 20)
+    suites = [slot_benchmarks(), parser_benchmarks(), format_benchmarks(), chat_benchmarks(args.fake_latency_ms)]
+
+    results = {}
+    for suite in suites:
+        for name, func in suite:
+            if args.filter not in name:
+                continue
+            # Full conversations are ~1000x slower than the micro benchmarks
+            runs = max(10, iterations // 10) if name.startswith('chat.') else iterations
+            results[name] = measure(func, runs, warmup, alloc_iterations)
+            print(f"{name:<40} p50 {results[name]['p50_us']:>10.1f}us  p99 {results[name]['p99_us']:>10.1f}us")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {DEFAULT_BASELINE}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.2f}x: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
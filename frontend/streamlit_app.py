@@ -40,16 +40,50 @@ def check_api_health():
         return False
 
 def send_message(message: str):
+    """Send a chat message, streaming progress from /api/chat/stream when the backend supports it"""
+    payload = {"message": message, "session_id": st.session_state.session_id}
     try:
+        with requests.post(f"{API_BASE_URL}/api/chat/stream", json=payload, stream=True, timeout=30) as response:
+            if response.status_code == 200:
+                return consume_chat_stream(response) or {"response": "Error: the response stream ended early", "intent": "error"}
+            if response.status_code not in (404, 405):
+                return {"response": f"Error: {response.status_code}", "intent": "error"}
+        
+        # Older backends without the streaming endpoint
         response = requests.post(
             f"{API_BASE_URL}/api/chat",
-            json={"message": message, "session_id": st.session_state.session_id},
+            json=payload,
             timeout=30
         )
         return response.json() if response.status_code == 200 else {"response": f"Error: {response.status_code}", "intent": "error"}
     except requests.exceptions.RequestException as e:
         return {"response": f"Connection error: {str(e)}", "intent": "error"}
 
+def consume_chat_stream(response):
+    """Show Server-Sent Events progress as it arrives and return the final payload"""
+    progress = st.empty()
+    event, slots_found = None, 0
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):])
+                if event == "intent" and data.get("intent") in ("check_availability", "book_appointment"):
+                    progress.info(f"🔍 Checking your calendar for {data.get('date')}...")
+                elif event == "slots":
+                    slots_found += len(data.get("slots", []))
+                    progress.info(f"🕐 Found {slots_found} free slots so far...")
+                elif event == "booking" and data.get("booked"):
+                    progress.success("✅ Booking confirmed, preparing details...")
+                elif event == "response":
+                    progress.markdown(data.get("response", ""))
+                elif event == "done":
+                    return data
+        return None
+    finally:
+        progress.empty()
+
 def demo_response(message: str):
     message_lower = message.lower()
     
@@ -139,7 +173,10 @@ def book_meeting_with_details(booking_data):
             "title": booking_data["title"],
             "description": booking_data["description"],
             "add_meet_link": booking_data["add_meet_link"],
-            "attendees": booking_data["attendees"]
+            "attendees": booking_data["attendees"],
+            # Lets the server skip re-checking the whole day for a slot it just offered
+            "session_id": st.session_state.session_id,
+            "slots_version": st.session_state.get("slots_version")
         }
         
         if check_api_health():
@@ -254,6 +291,7 @@ def handle_quick_action(example):
     ai_response = response.get("response", "Sorry, I couldn't process that.")
     booking_info = response.get("booking_info", {})
     available_slots = response.get("available_slots", [])
+    st.session_state.slots_version = response.get("slots_version")
     
     if "quickbook" in example.lower() or "quick book" in example.lower():
         st.session_state.current_available_slots = available_slots or demo_response("availability")["available_slots"]
@@ -444,6 +482,7 @@ Just ask me in plain English!"""
                 ai_response = response.get("response", "Sorry, I couldn't process that.")
                 booking_info = response.get("booking_info", {})
                 available_slots = response.get("available_slots", [])
+                st.session_state.slots_version = response.get("slots_version")
                 
                 if "quickbook" in prompt.lower() or "quick book" in prompt.lower():
                     st.session_state.current_available_slots = available_slots or demo_response("availability")["available_slots"]
@@ -503,6 +542,7 @@ Just ask me in plain English!"""
                 ai_response = response.get("response", "Sorry, I couldn't process that.")
                 booking_info = response.get("booking_info", {})
                 available_slots = response.get("available_slots", [])
+                st.session_state.slots_version = response.get("slots_version")
                 
                 if "quickbook" in prompt.lower() or "quick book" in prompt.lower():
                     st.session_state.current_available_slots = available_slots or demo_response("availability")["available_slots"]
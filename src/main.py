@@ -1,9 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+import asyncio
+import contextvars
+import json
+import logging
 import sys
+import time
 import os
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,10 +23,98 @@ load_dotenv()
 # Add the src directory to the path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from services.logging_setup import configure_logging, request_id_var, session_id_var
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
 from services.calendar_service import CalendarService
 from services.langgraph_service import LangGraphSchedulingAgent
+from services.metrics import HTTP_REQUEST_DURATION, REGISTRY
+from services.request_executor import CalendarUnavailableError
+
+# Calendar and LangGraph calls are blocking; run them on a bounded worker pool
+# so a slow Google response never stalls the event loop for other sessions.
+WORKER_THREADS = int(os.getenv("API_WORKER_THREADS", "16"))
+MAX_PENDING_REQUESTS = int(os.getenv("API_MAX_PENDING_REQUESTS", str(WORKER_THREADS * 4)))
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("API_QUEUE_TIMEOUT_SECONDS", "10"))
+# Retry-After sent with 503s when Google Calendar is throttling or down
+CALENDAR_RETRY_AFTER_SECONDS = os.getenv("CALENDAR_RETRY_AFTER_SECONDS", "5")
+
+worker_pool = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="calendar-worker")
+pending_requests = asyncio.Semaphore(MAX_PENDING_REQUESTS)
+
+async def acquire_worker_slot():
+    """Wait for a pending-request slot, shedding load with 503 when saturated"""
+    try:
+        await asyncio.wait_for(pending_requests.acquire(), timeout=QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly")
+
+async def run_blocking(func, *args, **kwargs):
+    """Run blocking work on the worker pool, shedding load with 503 when saturated"""
+    await acquire_worker_slot()
+    try:
+        loop = asyncio.get_running_loop()
+        # run_in_executor drops context vars; carry the request/session IDs along
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(worker_pool, partial(context.run, func, *args, **kwargs))
+    finally:
+        pending_requests.release()
+
+async def stream_blocking(func, *args, **kwargs):
+    """Start blocking work that reports progress through ``emit(event, data)``; returns its events as SSE.
+
+    The work runs on the worker pool like run_blocking. Its worker slot is
+    taken here, so saturation is a 503 before any response starts, and is
+    released when the work itself finishes rather than when the client stops
+    reading: a disconnected stream keeps counting against
+    API_MAX_PENDING_REQUESTS until its turn is over.
+    """
+    await acquire_worker_slot()
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    finished = object()
+
+    def emit(event, data):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def finish():
+        pending_requests.release()
+        events.put_nowait(finished)
+
+    def on_done(future):
+        # Runs on the worker thread after the last emit, so ``finished`` is queued last
+        try:
+            loop.call_soon_threadsafe(finish)
+        except RuntimeError:
+            pass  # loop already closed at shutdown
 
-app = FastAPI(title="AI Calendar Booking Agent with REAL LangGraph", version="3.0.0")
+    # run_in_executor drops context vars; carry the request/session IDs along
+    context = contextvars.copy_context()
+    try:
+        future = worker_pool.submit(context.run, partial(func, *args, emit=emit, **kwargs))
+    except BaseException:
+        pending_requests.release()
+        raise
+    future.add_done_callback(on_done)
+
+    async def relay():
+        while True:
+            item = await events.get()
+            if item is finished:
+                return
+            event, data = item
+            yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    return relay()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    worker_pool.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(title="AI Calendar Booking Agent with REAL LangGraph", version="3.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,11 +125,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    """Tag logs with a request ID (the caller's X-Request-ID if sent) and echo it back"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """Time every request into HTTP_REQUEST_DURATION, labelled by route template"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route templates, not raw paths, keep label cardinality bounded
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=request.method,
+                                      path=getattr(route, "path", "unmatched"), status=status)
+
+# Initialize services: one CalendarService shared by the API handlers and the agent
 calendar_service = CalendarService()
-print("🚀 Initializing LangGraph Agent...")
-langgraph_agent = LangGraphSchedulingAgent()
-print("✅ LangGraph Agent ready!")
+logger.info("Initializing LangGraph agent")
+langgraph_agent = LangGraphSchedulingAgent(calendar_service=calendar_service)
+logger.info("LangGraph agent ready")
 
 # Pydantic models
 class BookingRequest(BaseModel):
@@ -42,12 +165,28 @@ class BookingRequest(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     session_id: str = "default"
+    # "structured" omits the rendered markdown; clients render from ``payload``
+    response_format: str = "markdown"
 
 class ChatResponse(BaseModel):
     response: str
     intent: str = None
     available_slots: list = []
     booking_info: dict = {}
+    slots_version: Optional[str] = None
+    payload: dict = {}
+
+class CommonTimeRequest(BaseModel):
+    attendees: List[str] = Field(..., min_length=1, max_length=int(os.getenv("COMMON_TIME_MAX_ATTENDEES", "49")))
+    start: str
+    end: Optional[str] = None
+    duration: int = 60
+    step: Optional[int] = None
+    buffer: Optional[int] = None
+    # Slots with more busy attendees than this are dropped (default COMMON_TIME_MAX_UNAVAILABLE)
+    max_unavailable: Optional[int] = None
+    max_results: Optional[int] = None
+    include_primary: bool = True
 
 @app.get("/")
 async def root():
@@ -65,9 +204,15 @@ async def health_check():
         "status": "healthy", 
         "framework": "Real LangGraph StateGraph v0.4.9",
         "features": ["State Management", "Conditional Routing", "Conversation Flow"],
-        "google_auth": "Environment Variables" if os.getenv('GOOGLE_CLIENT_ID') else "File-based"
+        "google_auth": "Environment Variables" if os.getenv('GOOGLE_CLIENT_ID') else "File-based",
+        "calendar_backend": os.getenv("CALENDAR_BACKEND", "google").lower()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/api/book")
 async def book_meeting_endpoint(request: dict):
     """Enhanced booking endpoint with Meet link support"""
@@ -79,54 +224,205 @@ async def book_meeting_endpoint(request: dict):
         description = request.get("description", "")
         add_meet_link = request.get("add_meet_link", True)
         attendees = request.get("attendees", [])
+        session_id = request.get("session_id")
         
-        # Book the meeting
-        result = calendar_service.book_appointment(
-            datetime_str=datetime_str,
-            duration_minutes=duration,
-            title=title,
-            description=description,
-            add_meet_link=add_meet_link,
-            attendees=attendees
-        )
+        # Book the meeting, refusing slots that are already taken. A slot picked from
+        # the session's last slot list (matching slots_version) skips the full-day recheck.
+        if session_id:
+            result = await run_blocking(
+                langgraph_agent.book_slot,
+                session_id,
+                request.get("slots_version"),
+                datetime_str=datetime_str,
+                duration_minutes=duration,
+                title=title,
+                description=description,
+                add_meet_link=add_meet_link,
+                attendees=attendees
+            )
+        else:
+            result = await run_blocking(
+                calendar_service.book_if_free,
+                datetime_str=datetime_str,
+                duration_minutes=duration,
+                title=title,
+                description=description,
+                add_meet_link=add_meet_link,
+                attendees=attendees
+            )
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         return {
             "success": False,
             "message": f"Booking failed: {str(e)}"
         }
 
+@app.get("/api/book/{event_id}/status")
+async def booking_status_endpoint(event_id: str):
+    """Outcome of the post-insert race check for a recent booking"""
+    status = calendar_service.booking_status(event_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="No recent booking with that id")
+    return {"event_id": event_id, "status": status}
+
+@app.post("/api/book/batch")
+async def book_batch_endpoint(request: dict):
+    """Book many meetings at once using Google batch requests"""
+    bookings = request.get("bookings") or []
+    max_items = int(os.getenv("BATCH_BOOKING_MAX_ITEMS", "100"))
+    if not isinstance(bookings, list) or not bookings:
+        raise HTTPException(status_code=400, detail="'bookings' must be a non-empty list")
+    if len(bookings) > max_items:
+        raise HTTPException(status_code=400, detail=f"Too many bookings: {len(bookings)} (max {max_items})")
+
+    try:
+        results = await run_blocking(
+            calendar_service.book_many,
+            bookings,
+            check_availability=request.get("check_availability", True)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Batch booking error")
+        raise HTTPException(status_code=502, detail=f"Batch booking failed: {str(e)}")
+
+    booked = sum(1 for result in results if result["success"])
+    return {
+        "success": booked == len(results),
+        "booked": booked,
+        "failed": len(results) - booked,
+        "results": results
+    }
+
+@app.get("/api/availability")
+async def availability_endpoint(start: str, end: str = None, duration: int = 60, calendars: str = None,
+                                step: int = None, buffer: int = None):
+    """Free slots for every day in a date range, from one calendar fetch"""
+    calendar_ids = [calendar_id.strip() for calendar_id in calendars.split(",") if calendar_id.strip()] if calendars else None
+    try:
+        slots_by_day = await run_blocking(
+            calendar_service.get_free_time_slots_range,
+            start_date_str=start,
+            end_date_str=end or start,
+            duration_minutes=duration,
+            calendar_ids=calendar_ids,
+            step_minutes=step,
+            buffer_minutes=buffer
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CalendarUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": CALENDAR_RETRY_AFTER_SECONDS})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Availability endpoint error")
+        raise HTTPException(status_code=502, detail=f"Availability lookup failed: {str(e)}")
+
+    return {
+        "start": start,
+        "end": end or start,
+        "duration": duration,
+        "calendars": calendar_ids or ["primary"],
+        "days": slots_by_day,
+        "total_slots": sum(len(slots) for slots in slots_by_day.values())
+    }
+
+@app.post("/api/availability/common")
+async def common_availability_endpoint(request: CommonTimeRequest):
+    """Slots ranked by how many attendees are free, from one FreeBusy request"""
+    try:
+        result = await run_blocking(
+            calendar_service.find_common_time,
+            request.attendees,
+            start_date_str=request.start,
+            end_date_str=request.end,
+            duration_minutes=request.duration,
+            step_minutes=request.step,
+            buffer_minutes=request.buffer,
+            max_unavailable=request.max_unavailable,
+            max_results=request.max_results,
+            include_primary=request.include_primary
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except CalendarUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": CALENDAR_RETRY_AFTER_SECONDS})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Common availability error")
+        raise HTTPException(status_code=502, detail=f"Common availability lookup failed: {str(e)}")
+
+    return {
+        "start": request.start,
+        "end": request.end or request.start,
+        **result
+    }
+
 @app.post("/api/chat")
 async def chat_endpoint(request: ChatRequest):
     """Chat endpoint using REAL LangGraph workflow"""
+    session_id_var.set(request.session_id)
     try:
-        print(f"\n📨 Received chat request: {request.message}")
+        logger.info("Received chat request: %s", request.message)
         
         # Process message through REAL LangGraph workflow
-        result = langgraph_agent.process_message(
+        result = await run_blocking(
+            langgraph_agent.process_message,
             message=request.message,
-            session_id=request.session_id
+            session_id=request.session_id,
+            response_format=request.response_format
         )
         
         return ChatResponse(
             response=result["response"],
+            payload=result.get("payload", {}),
             intent=result["intent"],
             available_slots=result["available_slots"],
-            booking_info=result["booking_info"]
+            booking_info=result["booking_info"],
+            slots_version=result.get("slots_version")
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Chat endpoint error: {str(e)}")
+        logger.exception("Chat endpoint error")
         return ChatResponse(
             response=f"Sorry, I encountered an error: {str(e)}",
             intent="error"
         )
 
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Chat endpoint streaming node-by-node progress as Server-Sent Events.
+
+    Emits intent, availability, slots (in chunks), booking and response
+    events as the workflow runs, then a done event carrying the same payload
+    as /api/chat.
+    """
+    session_id_var.set(request.session_id)
+    logger.info("Received streaming chat request: %s", request.message)
+    events = await stream_blocking(
+        langgraph_agent.stream_message,
+        message=request.message,
+        session_id=request.session_id,
+        response_format=request.response_format
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     import uvicorn
-    print("🚀 Starting AI Calendar Agent with REAL LangGraph...")
+    logger.info("Starting AI Calendar Agent with REAL LangGraph")
     
     # Get configuration from environment
     host = os.getenv("API_HOST", "0.0.0.0")
@@ -0,0 +1,299 @@
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional; slot generation falls back to the pure-Python sweep
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Grids with at least this many candidate starts use the NumPy path when available
+VECTORIZE_MIN_CANDIDATES = 96
+# Day bitmaps memoised per index; long-lived indexes (the mirror) drop them past this
+BITMAP_MEMO_SIZE = 64
+
+
+def parse_event_time(value: Dict, local_timezone) -> datetime:
+    """Parse a Calendar API start/end object into an aware datetime"""
+    date_time = value.get('dateTime')
+    if date_time:
+        if date_time.endswith('Z'):
+            date_time = date_time[:-1] + '+00:00'
+        parsed = datetime.fromisoformat(date_time)
+        if parsed.tzinfo is None:
+            parsed = local_timezone.localize(parsed)
+        return parsed
+
+    # All-day events only carry a date; Google treats the end date as exclusive
+    return local_timezone.localize(datetime.fromisoformat(value['date']))
+
+
+def blocks_time(event: Dict) -> bool:
+    """Whether an event resource counts as busy, matching FreeBusy semantics.
+
+    Cancelled events, "show as available" events and invitations the
+    calendar owner declined don't block time. Declines are only visible
+    when the listing requested ``attendees(self,responseStatus)``.
+    """
+    if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+        return False
+    return not any(
+        attendee.get('self') and attendee.get('responseStatus') == 'declined'
+        for attendee in event.get('attendees') or ()
+    )
+
+
+class BusyIntervalIndex:
+    """Sorted, merged busy intervals stored as epoch seconds.
+
+    Events are parsed once when the index is built; every availability
+    query afterwards is a bisect or a single linear sweep over the arrays.
+    """
+
+    __slots__ = ('starts', 'ends', '_bitmaps')
+
+    def __init__(self, intervals: Iterable[Tuple[float, float]] = ()):
+        starts: List[float] = []
+        ends: List[float] = []
+        for start, end in sorted(interval for interval in intervals if interval[1] > interval[0]):
+            if ends and start <= ends[-1]:
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts = starts
+        self.ends = ends
+        self._bitmaps = {}
+
+    @classmethod
+    def from_events(cls, events: Iterable[Dict], local_timezone) -> 'BusyIntervalIndex':
+        """Build an index from Calendar API event resources"""
+        intervals = []
+        for event in events:
+            if not blocks_time(event):
+                continue
+            try:
+                start = parse_event_time(event['start'], local_timezone).timestamp()
+                end = parse_event_time(event['end'], local_timezone).timestamp()
+            except (KeyError, ValueError) as e:
+                logger.warning("Skipping event with unparseable time: %s", e)
+                continue
+            intervals.append((start, end))
+        return cls(intervals)
+
+    @classmethod
+    def from_freebusy(cls, busy: Iterable[Dict], local_timezone) -> 'BusyIntervalIndex':
+        """Build an index from the ``busy`` list of a FreeBusy API calendar entry"""
+        return cls(
+            (parse_event_time({'dateTime': period['start']}, local_timezone).timestamp(),
+             parse_event_time({'dateTime': period['end']}, local_timezone).timestamp())
+            for period in busy
+        )
+
+    @classmethod
+    def merge(cls, indexes: Iterable['BusyIntervalIndex']) -> 'BusyIntervalIndex':
+        """Union of several indexes, e.g. one per calendar"""
+        return cls(interval for index in indexes for interval in index.intervals())
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def intervals(self) -> List[Tuple[float, float]]:
+        return list(zip(self.starts, self.ends))
+
+    def is_free_ts(self, start: float, end: float) -> bool:
+        """True if no busy interval overlaps [start, end)"""
+        i = bisect_right(self.ends, start)
+        return i == len(self.starts) or self.starts[i] >= end
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        return self.is_free_ts(start.timestamp(), end.timestamp())
+
+    def day_bitmap(self, window_start: datetime, window_end: datetime) -> 'DayBitmap':
+        """Minute bitmap of the window, built once per window and index"""
+        key = (window_start.timestamp(), window_end.timestamp())
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            if len(self._bitmaps) >= BITMAP_MEMO_SIZE:
+                self._bitmaps.clear()
+            bitmap = self._bitmaps[key] = DayBitmap.from_index(self, window_start, window_end)
+        return bitmap
+
+    def free_slots(self, window_start: datetime, window_end: datetime,
+                   duration_minutes: int, step_minutes: int = 30, buffer_minutes: int = 0) -> List[datetime]:
+        """Start times of free slots on a fixed grid inside the window"""
+        return [
+            window_start + timedelta(minutes=offset)
+            for offset in self.free_slot_offsets(window_start, window_end, duration_minutes, step_minutes, buffer_minutes)
+        ]
+
+    def free_slot_offsets(self, window_start: datetime, window_end: datetime, duration_minutes: int,
+                          step_minutes: int = 30, buffer_minutes: int = 0,
+                          limit: Optional[int] = None) -> List[int]:
+        """Minute offsets from ``window_start`` of free slots on a fixed grid.
+
+        Candidates are aligned to ``step_minutes`` from ``window_start``; a slot
+        also needs ``buffer_minutes`` clear on both sides of it. Fine grids
+        are checked in one vectorized NumPy pass when NumPy is installed,
+        otherwise by a sweep that jumps past each busy interval. ``limit``
+        keeps only the first slots.
+        """
+        origin = window_start.timestamp()
+        window_minutes = int((window_end.timestamp() - origin) // 60)
+        if window_minutes < duration_minutes:
+            return []
+        candidates = (window_minutes - duration_minutes) // step_minutes + 1
+        if np is not None and candidates >= VECTORIZE_MIN_CANDIDATES:
+            offsets = self._free_offsets_numpy(origin, window_minutes, duration_minutes, step_minutes, buffer_minutes)
+        else:
+            offsets = self._free_offsets_sweep(origin, window_minutes, duration_minutes, step_minutes, buffer_minutes, limit)
+        return offsets[:limit] if limit is not None else offsets
+
+    def _free_offsets_sweep(self, origin: float, window_minutes: int, duration_minutes: int,
+                            step_minutes: int, buffer_minutes: int, limit: Optional[int]) -> List[int]:
+        # When a candidate hits a busy interval the sweep jumps straight to the
+        # first grid point after it, so the cost is linear in slots plus intervals
+        duration = duration_minutes * 60
+        step = step_minutes * 60
+        buffer = buffer_minutes * 60
+        last_start = origin + (window_minutes - duration_minutes) * 60
+        starts, ends = self.starts, self.ends
+        count = len(starts)
+
+        i = bisect_right(ends, origin - buffer)
+        offsets = []
+        offset = 0
+        while origin + offset <= last_start and (limit is None or len(offsets) < limit):
+            slot_start = origin + offset
+            while i < count and ends[i] + buffer <= slot_start:
+                i += 1
+            if i < count and starts[i] - buffer < slot_start + duration:
+                offset = int(-(-(ends[i] + buffer - origin) // step) * step)
+                continue
+            offsets.append(offset // 60)
+            offset += step
+        return offsets
+
+    def _free_offsets_numpy(self, origin: float, window_minutes: int, duration_minutes: int,
+                            step_minutes: int, buffer_minutes: int) -> List[int]:
+        # For every candidate, the first interval ending (plus buffer) after it
+        # is the only one that can overlap; one searchsorted call finds them all
+        buffer = buffer_minutes * 60
+        offsets = np.arange(0, window_minutes - duration_minutes + 1, step_minutes)
+        if not self.starts:
+            return offsets.tolist()
+        slot_starts = origin + offsets * 60.0
+        padded_starts = np.asarray(self.starts) - buffer
+        padded_ends = np.asarray(self.ends) + buffer
+        following = np.searchsorted(padded_ends, slot_starts, side='right')
+        blocking_start = np.append(padded_starts, np.inf)[following]
+        return offsets[blocking_start >= slot_starts + duration_minutes * 60].tolist()
+
+
+def _spread(bits: int, distance: int, forward: bool) -> int:
+    """OR of ``bits`` shifted by 0..distance, in O(log distance) big-int operations"""
+    covered = 0
+    while covered < distance:
+        shift = min(covered + 1, distance - covered)
+        bits |= bits << shift if forward else bits >> shift
+        covered += shift
+    return bits
+
+
+class DayBitmap:
+    """Busy minutes of one window (usually a calendar day) as a single int bitset.
+
+    Bit ``m`` is set when minute ``m`` after ``origin`` is busy; partially
+    busy minutes count as busy. Range checks are a shift and a mask, and
+    calendars combine with ``|`` (busy on any) or ``&`` (busy on all), which
+    makes intersecting several attendees' free time cheap.
+    """
+
+    __slots__ = ('origin', 'minutes', 'bits')
+
+    def __init__(self, origin: float, minutes: int, bits: int = 0):
+        self.origin = origin
+        self.minutes = minutes
+        self.bits = bits & ((1 << minutes) - 1)
+
+    @classmethod
+    def from_index(cls, index: BusyIntervalIndex, window_start: datetime, window_end: datetime) -> 'DayBitmap':
+        origin = window_start.timestamp()
+        minutes = int((window_end.timestamp() - origin) // 60)
+        bits = 0
+        for i in range(bisect_right(index.ends, origin), bisect_left(index.starts, origin + minutes * 60)):
+            low = max(0, int((index.starts[i] - origin) // 60))
+            high = min(minutes, -int(-(index.ends[i] - origin) // 60))
+            bits |= ((1 << (high - low)) - 1) << low
+        return cls(origin, minutes, bits)
+
+    @classmethod
+    def union(cls, bitmaps: Iterable['DayBitmap']) -> 'DayBitmap':
+        """Minutes busy on any of the bitmaps, i.e. the intersection of their free time"""
+        bitmaps = list(bitmaps)
+        result = bitmaps[0]
+        for bitmap in bitmaps[1:]:
+            result = result | bitmap
+        return result
+
+    @classmethod
+    def from_bytes(cls, origin: float, minutes: int, data: bytes) -> 'DayBitmap':
+        return cls(origin, minutes, int.from_bytes(data, 'little'))
+
+    def to_bytes(self) -> bytes:
+        return self.bits.to_bytes((self.minutes + 7) // 8, 'little')
+
+    def _check_compatible(self, other: 'DayBitmap') -> None:
+        if self.origin != other.origin or self.minutes != other.minutes:
+            raise ValueError("Bitmaps cover different windows")
+
+    def __or__(self, other: 'DayBitmap') -> 'DayBitmap':
+        self._check_compatible(other)
+        return DayBitmap(self.origin, self.minutes, self.bits | other.bits)
+
+    def __and__(self, other: 'DayBitmap') -> 'DayBitmap':
+        self._check_compatible(other)
+        return DayBitmap(self.origin, self.minutes, self.bits & other.bits)
+
+    def busy_minutes(self) -> int:
+        return bin(self.bits).count('1')
+
+    def is_free_minutes(self, start_minute: int, end_minute: int) -> bool:
+        """True if minutes [start, end) after ``origin`` are all free"""
+        if start_minute < 0 or end_minute > self.minutes:
+            raise ValueError("Range outside the bitmap window")
+        return not (self.bits >> start_minute) & ((1 << (end_minute - start_minute)) - 1)
+
+    def is_free_ts(self, start: float, end: float) -> bool:
+        return self.is_free_minutes(int((start - self.origin) // 60), -int(-(end - self.origin) // 60))
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        return self.is_free_ts(start.timestamp(), end.timestamp())
+
+    def free_slot_offsets(self, duration_minutes: int, step_minutes: int = 30, buffer_minutes: int = 0,
+                          limit: Optional[int] = None, start_minute: int = 0,
+                          end_minute: Optional[int] = None) -> List[int]:
+        """Free slots inside minutes [start_minute, end_minute), as offsets from ``start_minute``.
+
+        A start is blocked when any minute in [start - buffer, start +
+        duration + buffer) is busy; all blocked starts are computed at once
+        by spreading the busy bits, so only the grid lookup is per candidate.
+        Build the bitmap ``buffer`` minutes wider than the slot range (and
+        pass that range here) so busy time just outside it is honoured.
+        """
+        end_minute = self.minutes if end_minute is None else end_minute
+        if end_minute - start_minute < duration_minutes:
+            return []
+        blocked = _spread(_spread(self.bits, buffer_minutes, forward=True),
+                          duration_minutes - 1 + buffer_minutes, forward=False)
+        flags = format(blocked & ((1 << self.minutes) - 1), 'b').zfill(self.minutes)[::-1]
+        offsets = [
+            minute - start_minute
+            for minute in range(start_minute, end_minute - duration_minutes + 1, step_minutes)
+            if flags[minute] == '0'
+        ]
+        return offsets[:limit] if limit is not None else offsets
@@ -1,104 +1,69 @@
+import contextvars
+import logging
 import os
-import json
-import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import pytz
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
 
+from .availability import BusyIntervalIndex, DayBitmap, blocks_time, parse_event_time
+from .event_cache import CachedWindow, EventWindowCache
+from .event_store import EventStore
+from .google_client import GoogleCalendarClient, get_calendar_client
+from .request_executor import CalendarUnavailableError, RequestExecutor, get_request_executor
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class CalendarService:
-    def __init__(self):
-        self.SCOPES = ['https://www.googleapis.com/auth/calendar']
+    def __init__(self, client: GoogleCalendarClient = None, event_cache: EventWindowCache = None,
+                 executor: RequestExecutor = None):
+        self.client = client or get_calendar_client()
+        # Every Google call goes through the executor (rate limit, retries, deadline)
+        self.executor = executor or get_request_executor()
         self.service = None
+        self.event_cache = event_cache or EventWindowCache()
         timezone_str = os.getenv('TIMEZONE', 'Asia/Kolkata')
         self.local_timezone = pytz.timezone(timezone_str)
-
-    def _create_credentials_from_env(self):
-        credentials_data = {
-            "installed": {
-                "client_id": os.getenv('GOOGLE_CLIENT_ID'),
-                "project_id": os.getenv('GOOGLE_PROJECT_ID'),
-                "auth_uri": os.getenv('GOOGLE_AUTH_URI', 'https://accounts.google.com/o/oauth2/auth'),
-                "token_uri": os.getenv('GOOGLE_TOKEN_URI', 'https://oauth2.googleapis.com/token'),
-                "auth_provider_x509_cert_url": os.getenv('GOOGLE_AUTH_PROVIDER_X509_CERT_URL', 'https://www.googleapis.com/oauth2/v1/certs'),
-                "client_secret": os.getenv('GOOGLE_CLIENT_SECRET'),
-                "redirect_uris": [os.getenv('GOOGLE_REDIRECT_URIS', 'http://localhost')]
-            }
-        }
-        
-        required_fields = ['client_id', 'client_secret', 'project_id']
-        missing_fields = [field for field in required_fields if not credentials_data['installed'].get(field)]
+        self.availability_backend = os.getenv('CALENDAR_AVAILABILITY_BACKEND', 'freebusy').lower()
+        # Slot grid: candidate starts every SLOT_STEP_MINUTES, with SLOT_BUFFER_MINUTES kept
+        # clear around busy events; AVAILABILITY_MAX_SLOTS_PER_DAY=0 returns every free slot
+        self.slot_step_minutes = int(os.getenv('SLOT_STEP_MINUTES', 30))
+        self.slot_buffer_minutes = int(os.getenv('SLOT_BUFFER_MINUTES', 0))
+        self.max_slots_per_day = int(os.getenv('AVAILABILITY_MAX_SLOTS_PER_DAY', 0))
+        self._clock_labels = None
         
-        if missing_fields:
-            raise ValueError(f"Missing required Google OAuth environment variables: {', '.join(missing_fields)}")
-        
-        return credentials_data
+        # With the mirror backend, primary-calendar availability is answered from a
+        # local copy kept current by syncToken deltas
+        self.event_store = None
+        if self.availability_backend == 'mirror':
+            self.event_store = EventStore('primary', os.getenv('EVENT_STORE_DB_PATH') or None)
+        self.sync_interval_seconds = float(os.getenv('EVENT_STORE_SYNC_INTERVAL_SECONDS', 30))
+        self._store_sync_lock = threading.Lock()
+        self._sync_thread_lock = threading.Lock()
+        self._sync_thread = None
+        # Slots claimed by bookings in flight in this process, checked alongside the busy index
+        self._pending_bookings = {}
+        self._booking_lock = threading.Lock()
+        # Post-insert race check: background (off the response path), true (before
+        # answering) or false; outcomes are kept per event id for booking_status()
+        self.verify_mode = os.getenv('BOOKING_VERIFY_AFTER_INSERT', 'background').lower()
+        self._verify_pool = None
+        self._booking_status = OrderedDict()
+        self._booking_status_lock = threading.Lock()
 
     def authenticate(self):
-        if self.service is not None:
-            return self.service
-            
-        creds = None
-        
-        if os.path.exists('token.json'):
-            creds = Credentials.from_authorized_user_file('token.json', self.SCOPES)
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                    print("Google Calendar token refreshed successfully")
-                except Exception as e:
-                    print(f"Token refresh failed: {e}. Creating new credentials...")
-                    creds = None
-            
-            if not creds:
-                try:
-                    credentials_data = self._create_credentials_from_env()
-                    
-                    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
-                        json.dump(credentials_data, temp_file)
-                        temp_credentials_path = temp_file.name
-                    
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        temp_credentials_path, self.SCOPES)
-                    creds = flow.run_local_server(port=0)
-                    
-                    os.unlink(temp_credentials_path)
-                    
-                    print("Google Calendar authenticated using environment variables")
-                    
-                except (ValueError, FileNotFoundError) as e:
-                    print(f"Environment variables not found or incomplete: {e}")
-                    
-                    if os.path.exists('credentials.json'):
-                        print("Falling back to credentials.json file...")
-                        flow = InstalledAppFlow.from_client_secrets_file(
-                            'credentials.json', self.SCOPES)
-                        creds = flow.run_local_server(port=0)
-                        print("Google Calendar authenticated using credentials.json")
-                    else:
-                        raise Exception(
-                            "No valid Google OAuth credentials found! "
-                            "Please either:\n"
-                            "1. Set environment variables (GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, etc.)\n"
-                            "2. Place credentials.json in the project root"
-                        )
-            
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-
-        self.service = build('calendar', 'v3', credentials=creds)
-        print("Google Calendar service initialized successfully")
+        if self.service is None:
+            self.service = self.client.service
         return self.service
 
-    def check_availability(self, start_time_str, end_time_str):
+    def check_availability(self, start_time_str, end_time_str, calendar_ids=None):
         try:
             if not self.service:
                 self.authenticate()
@@ -123,29 +88,27 @@ class CalendarService:
             else:
                 end_time = end_time_str
             
-            start_utc = start_time.astimezone(pytz.UTC)
-            end_utc = end_time.astimezone(pytz.UTC)
-            
-            events_result = self.service.events().list(
-                calendarId='primary',
-                timeMin=start_utc.isoformat(),
-                timeMax=end_utc.isoformat(),
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
-            is_available = len(events) == 0
-            
-            if not is_available:
-                print(f"Conflict found for {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}: {len(events)} events")
-            else:
-                print(f"Slot is free: {start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}")
+            # Queries inside business hours read the day's bitmap, so repeated
+            # checks on the same day are a mask test against one cached fetch
+            day_start, day_end = self._business_window(start_time.astimezone(self.local_timezone).date())
+            if not (day_start <= start_time and end_time <= day_end):
+                day_start, day_end = start_time, end_time
+            bitmap = self.get_day_bitmap(day_start, day_end, calendar_ids)
+            is_available = bitmap.is_free(start_time, end_time)
+            
+            if logger.isEnabledFor(logging.DEBUG):
+                if not is_available:
+                    logger.debug("Conflict found for %s-%s: %d busy minutes that day",
+                                 start_time.strftime('%H:%M'), end_time.strftime('%H:%M'), bitmap.busy_minutes())
+                else:
+                    logger.debug("Slot is free: %s-%s", start_time.strftime('%H:%M'), end_time.strftime('%H:%M'))
             
             return is_available
             
-        except Exception as e:
-            print(f"Error checking availability: {e}")
+        except CalendarUnavailableError:
+            raise
+        except Exception:
+            logger.exception("Error checking availability")
             return False
 
     def convert_to_12_hour_format(self, time_24):
@@ -162,125 +125,512 @@ class CalendarService:
         except:
             return time_24
 
-    def get_free_time_slots(self, date_str: str, duration_minutes: int = 60):
+    def _list_events(self, start_time, end_time, calendar_id='primary', sync_token=None):
+        """List events overlapping the window, following pagination.
+
+        With ``sync_token`` only the changes since that token are returned
+        (the Calendar API rejects time bounds on incremental requests).
+        Returns (events, next_sync_token).
+        """
+        if not self.service:
+            self.authenticate()
+        
+        if sync_token:
+            window = {'syncToken': sync_token}
+        else:
+            window = {
+                'timeMin': start_time.astimezone(pytz.UTC).isoformat(),
+                'timeMax': end_time.astimezone(pytz.UTC).isoformat()
+            }
+        
+        events = []
+        page_token = None
+        while True:
+            events_result = self.executor.execute(self.service.events().list(
+                calendarId=calendar_id,
+                singleEvents=True,
+                maxResults=2500,
+                pageToken=page_token,
+                fields='nextPageToken,nextSyncToken,items(id,created,start,end,status,transparency,attendees(self,responseStatus))',
+                **window
+            ))
+            events.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return events, events_result.get('nextSyncToken')
+
+    def _events_busy_index(self, start_time, end_time, calendar_id='primary', use_cache=True):
+        """Busy index from events().list, refreshed incrementally via syncToken when cached"""
+        start_ts, end_ts = start_time.timestamp(), end_time.timestamp()
+        cached = self.event_cache.get_window('events', calendar_id, start_ts, end_ts) if use_cache else None
+        events = None
+        
+        if cached is not None and cached.sync_token:
+            try:
+                changes, sync_token = self._list_events(start_time, end_time, calendar_id, sync_token=cached.sync_token)
+                events = dict(cached.events)
+                for event in changes:
+                    events.pop(event['id'], None)
+                    if event.get('status') != 'cancelled' and self._overlaps(event, start_ts, end_ts):
+                        events[event['id']] = event
+                logger.debug("Incremental sync for %s: %d changed events", calendar_id, len(changes))
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                logger.info("Sync token expired for %s, doing a full fetch", calendar_id)
+                events = None
+        
+        if events is None:
+            items, sync_token = self._list_events(start_time, end_time, calendar_id)
+            events = {event['id']: event for event in items if 'id' in event}
+        
+        index = BusyIntervalIndex.from_events(events.values(), self.local_timezone)
+        self.event_cache.put(CachedWindow('events', calendar_id, start_ts, end_ts, index, events, sync_token))
+        return index
+
+    def _overlaps(self, event, start_ts, end_ts):
         try:
-            if not self.service:
-                self.authenticate()
-            
-            if duration_minutes == 60:
-                duration_minutes = int(os.getenv('DEFAULT_MEETING_DURATION', 60))
-                
-            if date_str.lower() == 'today':
-                target_date = datetime.now(self.local_timezone).date()
-            elif date_str.lower() == 'tomorrow':
-                target_date = (datetime.now(self.local_timezone) + timedelta(days=1)).date()
+            event_start = parse_event_time(event['start'], self.local_timezone).timestamp()
+            event_end = parse_event_time(event['end'], self.local_timezone).timestamp()
+        except (KeyError, ValueError):
+            return False
+        return event_start < end_ts and event_end > start_ts
+
+    def _query_freebusy(self, start_time, end_time, calendar_ids):
+        """Busy intervals for several calendars in one FreeBusy request.
+
+        Returns a dict of calendar id -> BusyIntervalIndex. Calendars the API
+        reported errors for are left out so the caller can fall back.
+        """
+        if not self.service:
+            self.authenticate()
+        
+        freebusy_result = self.executor.execute(self.service.freebusy().query(body={
+            'timeMin': start_time.astimezone(pytz.UTC).isoformat(),
+            'timeMax': end_time.astimezone(pytz.UTC).isoformat(),
+            'timeZone': str(self.local_timezone),
+            'items': [{'id': calendar_id} for calendar_id in calendar_ids]
+        }))
+        
+        indexes = {}
+        calendars = freebusy_result.get('calendars', {})
+        for calendar_id in calendar_ids:
+            entry = calendars.get(calendar_id)
+            if entry is None or entry.get('errors'):
+                logger.warning("FreeBusy returned no data for %s: %s", calendar_id, entry.get('errors') if entry else 'missing')
+                continue
+            indexes[calendar_id] = BusyIntervalIndex.from_freebusy(entry.get('busy', []), self.local_timezone)
+        return indexes
+
+    def sync_event_store(self, force_full=False):
+        """Bring the local mirror up to date: a syncToken delta, or a full listing
+        when there is no token yet, the token expired (410) or the horizon is due
+        to roll forward."""
+        store = self.event_store
+        with self._store_sync_lock:
+            resync_seconds = float(os.getenv('EVENT_STORE_RESYNC_HOURS', 24)) * 3600
+            if not force_full and store.is_synced and time.time() - store.last_full_sync < resync_seconds:
+                try:
+                    changes, sync_token = self._list_events(None, None, store.calendar_id, sync_token=store.sync_token)
+                    store.apply_changes(changes, sync_token, self.local_timezone)
+                    return
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+                    logger.info("Mirror sync token expired for %s, doing a full sync", store.calendar_id)
+            
+            now = datetime.now(self.local_timezone)
+            horizon_start = now - timedelta(days=int(os.getenv('EVENT_STORE_PAST_DAYS', 1)))
+            horizon_end = now + timedelta(days=int(os.getenv('EVENT_STORE_HORIZON_DAYS', 90)))
+            events, sync_token = self._list_events(horizon_start, horizon_end, store.calendar_id)
+            store.replace_all(events, sync_token, horizon_start.timestamp(), horizon_end.timestamp(), self.local_timezone)
+            logger.debug("Mirrored %d events for %s", len(store), store.calendar_id)
+
+    def _run_sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval_seconds)
+            try:
+                self.sync_event_store()
+            except Exception as e:
+                logger.warning("Background calendar sync failed: %s", e)
+
+    def _mirror_busy_index(self, start_ts, end_ts):
+        """Busy index from the local mirror, or None if it can't answer for the window"""
+        store = self.event_store
+        if self._sync_thread is None and os.getenv('EVENT_STORE_BACKGROUND_SYNC', 'true').lower() == 'true':
+            with self._sync_thread_lock:
+                if self._sync_thread is None:
+                    self._sync_thread = threading.Thread(target=self._run_sync_loop, name='calendar-sync', daemon=True)
+                    self._sync_thread.start()
+        
+        # The background loop normally keeps the mirror fresh; only sync inline
+        # when it has fallen well behind (or never ran)
+        if time.time() - store.last_synced > self.sync_interval_seconds * 3:
+            try:
+                self.sync_event_store()
+            except Exception as e:
+                logger.warning("Calendar mirror sync failed: %s", e)
+                return None
+        
+        if not store.covers(start_ts, end_ts):
+            return None
+        return store.busy_index()
+
+    def get_busy_indexes(self, start_time, end_time, calendar_ids=None, use_cache=True, skip_unavailable=False):
+        """Per-calendar busy indexes for the window.
+
+        The local mirror (CALENDAR_AVAILABILITY_BACKEND=mirror) and fresh
+        cached windows are used first. The rest come from the FreeBusy
+        API (one request for all calendars) unless
+        CALENDAR_AVAILABILITY_BACKEND=events; calendars FreeBusy can't answer
+        for are fetched with events().list instead. With ``skip_unavailable``
+        (other people's calendars, which events().list can't read) FreeBusy
+        is always used and unanswered calendars are left out of the result.
+        """
+        calendar_ids = list(calendar_ids or ['primary'])
+        start_ts, end_ts = start_time.timestamp(), end_time.timestamp()
+        indexes = {}
+        
+        if self.event_store is not None and self.event_store.calendar_id in calendar_ids:
+            mirror_index = self._mirror_busy_index(start_ts, end_ts)
+            if mirror_index is not None:
+                indexes[self.event_store.calendar_id] = mirror_index
+        
+        if use_cache:
+            for calendar_id in calendar_ids:
+                if calendar_id in indexes:
+                    continue
+                cached_index = self.event_cache.find_busy_index(calendar_id, start_ts, end_ts)
+                if cached_index is not None:
+                    indexes[calendar_id] = cached_index
+        
+        missing = [calendar_id for calendar_id in calendar_ids if calendar_id not in indexes]
+        if missing and (self.availability_backend in ('freebusy', 'mirror') or skip_unavailable):
+            try:
+                fetched = self._query_freebusy(start_time, end_time, missing)
+                for calendar_id, index in fetched.items():
+                    self.event_cache.put(CachedWindow('freebusy', calendar_id, start_ts, end_ts, index))
+                indexes.update(fetched)
+            except CalendarUnavailableError:
+                # Throttled or down: listing events instead would only add load
+                raise
+            except Exception as e:
+                if skip_unavailable:
+                    raise
+                logger.warning("FreeBusy query failed, falling back to events listing: %s", e)
+        
+        for calendar_id in calendar_ids:
+            if calendar_id not in indexes and not skip_unavailable:
+                indexes[calendar_id] = self._events_busy_index(start_time, end_time, calendar_id, use_cache)
+        return indexes
+
+    def get_busy_index(self, start_time, end_time, calendar_ids=None, use_cache=True):
+        """Busy intervals across the given calendars (default: primary) merged into one index"""
+        indexes = self.get_busy_indexes(start_time, end_time, calendar_ids, use_cache)
+        if len(indexes) == 1:
+            return next(iter(indexes.values()))
+        return BusyIntervalIndex.merge(indexes.values())
+
+    def get_day_bitmap(self, window_start, window_end, calendar_ids=None, use_cache=True):
+        """Minute bitmap of the window, busy where any of the calendars is busy"""
+        indexes = self.get_busy_indexes(window_start, window_end, calendar_ids, use_cache)
+        return DayBitmap.union(index.day_bitmap(window_start, window_end) for index in indexes.values())
+
+    def _format_slot(self, slot_start, slot_end):
+        start_24 = slot_start.strftime('%H:%M')
+        end_24 = slot_end.strftime('%H:%M')
+        return {
+            'start': self.convert_to_12_hour_format(start_24),
+            'end': self.convert_to_12_hour_format(end_24),
+            'start_24': start_24,
+            'end_24': end_24,
+            'datetime': slot_start.isoformat()
+        }
+
+    def _format_slots(self, window_start, offsets, duration_minutes):
+        """Slot dicts for minute offsets from ``window_start``, formatted by table lookup"""
+        if self._clock_labels is None:
+            self._clock_labels = [
+                (f"{minute // 60:02d}:{minute % 60:02d}", self.convert_to_12_hour_format(f"{minute // 60:02d}:{minute % 60:02d}"))
+                for minute in range(24 * 60)
+            ]
+        labels = self._clock_labels
+        
+        iso = window_start.isoformat()
+        base = window_start.hour * 60 + window_start.minute
+        aligned = window_start.second == 0 and window_start.microsecond == 0
+        prefix, suffix = iso[:11], iso[16:]
+        slot_duration = timedelta(minutes=duration_minutes)
+        
+        slots = []
+        for offset in offsets:
+            start = base + offset
+            if not aligned or start >= 24 * 60:
+                slot_start = window_start + timedelta(minutes=offset)
+                slots.append(self._format_slot(slot_start, slot_start + slot_duration))
+                continue
+            start_24, start_12 = labels[start]
+            end_24, end_12 = labels[(start + duration_minutes) % (24 * 60)]
+            slots.append({
+                'start': start_12,
+                'end': end_12,
+                'start_24': start_24,
+                'end_24': end_24,
+                'datetime': prefix + start_24 + suffix
+            })
+        return slots
+
+    def _resolve_date(self, date_str: str):
+        if date_str.lower() == 'today':
+            return datetime.now(self.local_timezone).date()
+        elif date_str.lower() == 'tomorrow':
+            return (datetime.now(self.local_timezone) + timedelta(days=1)).date()
+        return datetime.strptime(date_str, '%Y-%m-%d').date()
+
+    def _business_window(self, target_date):
+        start_hour = int(os.getenv('BUSINESS_HOURS_START', 9))
+        end_hour = int(os.getenv('BUSINESS_HOURS_END', 21))
+        
+        start_datetime = self.local_timezone.localize(
+            datetime.combine(target_date, datetime.min.time().replace(hour=start_hour, minute=0))
+        )
+        end_datetime = self.local_timezone.localize(
+            datetime.combine(target_date, datetime.min.time().replace(hour=end_hour, minute=0))
+        )
+        return start_datetime, end_datetime
+
+    def get_free_time_slots_range(self, start_date_str: str, end_date_str: str, duration_minutes: int = 60, calendar_ids=None,
+                                  step_minutes: int = None, buffer_minutes: int = None):
+        """Free slots for every day in [start, end], fetched with a single events listing.
+
+        Returns a dict mapping ISO dates to slot lists; with several
+        ``calendar_ids`` a slot is only free if it is free on all of them.
+        Step and buffer default to SLOT_STEP_MINUTES / SLOT_BUFFER_MINUTES.
+        Several calendars are intersected by OR-ing their day bitmaps rather
+        than merging interval lists.
+        Raises ValueError for malformed or oversized ranges.
+        """
+        if duration_minutes == 60:
+            duration_minutes = int(os.getenv('DEFAULT_MEETING_DURATION', 60))
+        if duration_minutes <= 0:
+            raise ValueError("Duration must be a positive number of minutes")
+        step_minutes = self.slot_step_minutes if step_minutes is None else step_minutes
+        buffer_minutes = self.slot_buffer_minutes if buffer_minutes is None else buffer_minutes
+        if step_minutes <= 0 or buffer_minutes < 0:
+            raise ValueError("Slot step must be positive and buffer non-negative")
+        
+        start_date = self._resolve_date(start_date_str)
+        end_date = self._resolve_date(end_date_str)
+        if end_date < start_date:
+            raise ValueError("End date must not be before start date")
+        
+        max_days = int(os.getenv('AVAILABILITY_MAX_RANGE_DAYS', 31))
+        day_count = (end_date - start_date).days + 1
+        if day_count > max_days:
+            raise ValueError(f"Date range too large: {day_count} days (max {max_days})")
+        
+        windows = [self._business_window(start_date + timedelta(days=offset)) for offset in range(day_count)]
+        
+        logger.debug("Checking availability from %s to %s", windows[0][0], windows[-1][1])
+        
+        # Padded by the buffer so events just outside business hours still count
+        pad = timedelta(minutes=buffer_minutes)
+        indexes = self.get_busy_indexes(windows[0][0] - pad, windows[-1][1] + pad, calendar_ids)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Found %d busy intervals", sum(len(index) for index in indexes.values()))
+        
+        limit = self.max_slots_per_day or None
+        slots_by_day = {}
+        for day_start, day_end in windows:
+            if len(indexes) == 1:
+                busy_index = next(iter(indexes.values()))
+                offsets = busy_index.free_slot_offsets(day_start, day_end, duration_minutes, step_minutes, buffer_minutes, limit)
             else:
-                target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            
-            start_hour = int(os.getenv('BUSINESS_HOURS_START', 9))
-            end_hour = int(os.getenv('BUSINESS_HOURS_END', 21))
-            
-            start_datetime = self.local_timezone.localize(
-                datetime.combine(target_date, datetime.min.time().replace(hour=start_hour, minute=0))
-            )
-            end_datetime = self.local_timezone.localize(
-                datetime.combine(target_date, datetime.min.time().replace(hour=end_hour, minute=0))
-            )
-            
-            print(f"Checking availability from {start_datetime} to {end_datetime}")
-            
-            start_utc = start_datetime.astimezone(pytz.UTC)
-            end_utc = end_datetime.astimezone(pytz.UTC)
-            
-            events_result = self.service.events().list(
-                calendarId='primary',
-                timeMin=start_utc.isoformat(),
-                timeMax=end_utc.isoformat(),
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
-            print(f"Found {len(events)} existing events")
-            
-            free_slots = []
-            current_time = start_datetime
-            slot_duration = timedelta(minutes=duration_minutes)
-            
-            while current_time + slot_duration <= end_datetime:
-                slot_end = current_time + slot_duration
-                
-                is_free = True
-                for event in events:
-                    event_start_str = event['start'].get('dateTime', event['start'].get('date'))
-                    event_end_str = event['end'].get('dateTime', event['end'].get('date'))
-                    
-                    if 'T' in event_start_str:
-                        if event_start_str.endswith('Z'):
-                            event_start = datetime.fromisoformat(event_start_str.replace('Z', '+00:00'))
-                        else:
-                            event_start = datetime.fromisoformat(event_start_str)
-                        
-                        if event_start.tzinfo:
-                            event_start = event_start.astimezone(self.local_timezone)
-                        else:
-                            event_start = self.local_timezone.localize(event_start)
-                    else:
-                        event_start = self.local_timezone.localize(
-                            datetime.fromisoformat(event_start_str + 'T00:00:00')
-                        )
-                    
-                    if 'T' in event_end_str:
-                        if event_end_str.endswith('Z'):
-                            event_end = datetime.fromisoformat(event_end_str.replace('Z', '+00:00'))
-                        else:
-                            event_end = datetime.fromisoformat(event_end_str)
-                        
-                        if event_end.tzinfo:
-                            event_end = event_end.astimezone(self.local_timezone)
-                        else:
-                            event_end = self.local_timezone.localize(event_end)
-                    else:
-                        event_end = self.local_timezone.localize(
-                            datetime.fromisoformat(event_end_str + 'T23:59:59')
-                        )
-                    
-                    if (current_time < event_end and slot_end > event_start):
-                        is_free = False
-                        print(f"Slot {current_time.strftime('%H:%M')}-{slot_end.strftime('%H:%M')} conflicts with event {event_start.strftime('%H:%M')}-{event_end.strftime('%H:%M')}")
-                        break
-                
-                if is_free:
-                    start_12hr = self.convert_to_12_hour_format(current_time.strftime('%H:%M'))
-                    end_12hr = self.convert_to_12_hour_format(slot_end.strftime('%H:%M'))
-                    
-                    free_slots.append({
-                        'start': start_12hr,
-                        'end': end_12hr,
-                        'start_24': current_time.strftime('%H:%M'),
-                        'end_24': slot_end.strftime('%H:%M'),
-                        'datetime': current_time.isoformat()
-                    })
-                    print(f"Free slot found: {start_12hr} - {end_12hr}")
-                
-                current_time += timedelta(minutes=30)
-            
-            print(f"Total free slots found: {len(free_slots)}")
-            
-            return free_slots
-            
-        except Exception as e:
-            print(f"Error getting availability: {e}")
-            import traceback
-            traceback.print_exc()
+                bitmap = DayBitmap.union(index.day_bitmap(day_start - pad, day_end + pad) for index in indexes.values())
+                offsets = bitmap.free_slot_offsets(duration_minutes, step_minutes, buffer_minutes, limit,
+                                                   start_minute=buffer_minutes, end_minute=bitmap.minutes - buffer_minutes)
+            slots_by_day[day_start.date().isoformat()] = self._format_slots(day_start, offsets, duration_minutes)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Total free slots found: %d", sum(len(slots) for slots in slots_by_day.values()))
+        
+        return slots_by_day
+
+    def find_common_time(self, attendees, start_date_str: str, end_date_str: str = None, duration_minutes: int = 60,
+                         step_minutes: int = None, buffer_minutes: int = None, max_unavailable: int = None,
+                         max_results: int = None, include_primary: bool = True):
+        """Rank slots in [start, end] by how many attendees can make them.
+
+        Free/busy for every attendee (plus the organizer's primary calendar,
+        which must be free) comes from one FreeBusy request. Each attendee's
+        day is turned into a minute bitmap and their free grid starts into a
+        set, so every candidate is scored with set lookups instead of
+        interval comparisons. Slots with more than ``max_unavailable``
+        attendees busy are dropped; the rest are ordered by fewest
+        unavailable, then earliest. Attendees FreeBusy can't answer for
+        (unknown or private calendars) are reported and left out of the
+        ranking. Raises ValueError for malformed requests.
+        """
+        attendees = list(dict.fromkeys(email.strip().lower() for email in attendees or [] if email and email.strip()))
+        if not attendees:
+            raise ValueError("At least one attendee is required")
+        max_attendees = int(os.getenv('COMMON_TIME_MAX_ATTENDEES', 49))
+        if len(attendees) > max_attendees:
+            raise ValueError(f"Too many attendees: {len(attendees)} (max {max_attendees})")
+        if duration_minutes <= 0:
+            raise ValueError("Duration must be a positive number of minutes")
+        step_minutes = self.slot_step_minutes if step_minutes is None else step_minutes
+        buffer_minutes = self.slot_buffer_minutes if buffer_minutes is None else buffer_minutes
+        if step_minutes <= 0 or buffer_minutes < 0:
+            raise ValueError("Slot step must be positive and buffer non-negative")
+        if max_unavailable is None:
+            max_unavailable = int(os.getenv('COMMON_TIME_MAX_UNAVAILABLE', 1))
+        if max_results is None:
+            max_results = int(os.getenv('COMMON_TIME_MAX_RESULTS', 20))
+        
+        start_date = self._resolve_date(start_date_str)
+        end_date = self._resolve_date(end_date_str or start_date_str)
+        if end_date < start_date:
+            raise ValueError("End date must not be before start date")
+        max_days = int(os.getenv('AVAILABILITY_MAX_RANGE_DAYS', 31))
+        day_count = (end_date - start_date).days + 1
+        if day_count > max_days:
+            raise ValueError(f"Date range too large: {day_count} days (max {max_days})")
+        
+        windows = [self._business_window(start_date + timedelta(days=offset)) for offset in range(day_count)]
+        pad = timedelta(minutes=buffer_minutes)
+        required = ['primary'] if include_primary else []
+        calendar_ids = required + [email for email in attendees if email not in required]
+        
+        indexes = self.get_busy_indexes(windows[0][0] - pad, windows[-1][1] + pad, calendar_ids, skip_unavailable=True)
+        unknown = [calendar_id for calendar_id in calendar_ids if calendar_id not in indexes]
+        if any(calendar_id in unknown for calendar_id in required):
+            raise ValueError("Organizer calendar is unavailable")
+        known = [email for email in attendees if email in indexes]
+        if not known:
+            # Every slot would otherwise look free for "everyone" with nobody checked
+            raise ValueError(f"Couldn't check the calendar of any attendee: {', '.join(attendees)}")
+        logger.debug("Finding common time for %d attendees (%d unknown) over %d days", len(known), len(unknown), day_count)
+        
+        ranked = []
+        for day_start, day_end in windows:
+            free_by_calendar = {}
+            for calendar_id in calendar_ids:
+                if calendar_id in indexes:
+                    bitmap = indexes[calendar_id].day_bitmap(day_start - pad, day_end + pad)
+                    free_by_calendar[calendar_id] = set(bitmap.free_slot_offsets(
+                        duration_minutes, step_minutes, buffer_minutes,
+                        start_minute=buffer_minutes, end_minute=bitmap.minutes - buffer_minutes))
+            
+            candidates = set.intersection(*(free_by_calendar[calendar_id] for calendar_id in required)) if required else None
+            day_minutes = int((day_end - day_start).total_seconds() // 60)
+            for offset in range(0, day_minutes - duration_minutes + 1, step_minutes):
+                if candidates is not None and offset not in candidates:
+                    continue
+                unavailable = [email for email in known if offset not in free_by_calendar[email]]
+                if len(unavailable) <= max_unavailable:
+                    ranked.append((len(unavailable), day_start, offset, unavailable))
+        
+        ranked.sort(key=lambda item: (item[0], item[1], item[2]))
+        slots = []
+        for unavailable_count, day_start, offset, unavailable in ranked[:max_results or None]:
+            slot = self._format_slots(day_start, [offset], duration_minutes)[0]
+            slot['date'] = day_start.date().isoformat()
+            slot['available_count'] = len(known) - unavailable_count
+            slot['unavailable'] = unavailable
+            slots.append(slot)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Common time candidates: %d, everyone free: %d", len(ranked), sum(1 for item in ranked if not item[0]))
+        
+        return {
+            'attendees': known,
+            'unknown_attendees': unknown,
+            'duration': duration_minutes,
+            'slots': slots,
+            'total_candidates': len(ranked)
+        }
+
+    def get_free_time_slots(self, date_str: str, duration_minutes: int = 60):
+        try:
+            slots_by_day = self.get_free_time_slots_range(date_str, date_str, duration_minutes)
+            return next(iter(slots_by_day.values()))
+            
+        except CalendarUnavailableError:
+            # Being throttled is not the same as being fully booked
+            raise
+        except Exception:
+            logger.exception("Error getting availability")
             return []
 
+    def _build_event_body(self, start_time, end_time, title, description="", add_meet_link=True, attendees=None):
+        event = {
+            'summary': title,
+            'description': description,
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': str(start_time.tzinfo),
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': str(end_time.tzinfo),
+            },
+        }
+        
+        if add_meet_link:
+            event['conferenceData'] = {
+                'createRequest': {
+                    'requestId': f"meet-{uuid.uuid4().hex}",
+                    'conferenceSolutionKey': {
+                        'type': 'hangoutsMeet'
+                    }
+                }
+            }
+        
+        if attendees:
+            event['attendees'] = [{'email': email} for email in attendees]
+        
+        return event
+
+    def _record_created_event(self, event_result, start_time, end_time, attendees=None):
+        # Keep cached primary windows warm with the new event; attendee calendars
+        # changed in ways we can't see, so drop theirs
+        self.event_cache.record_busy('primary', start_time.timestamp(), end_time.timestamp())
+        for calendar_id in attendees or []:
+            self.event_cache.invalidate(calendar_id, start_time.timestamp(), end_time.timestamp())
+        if self.event_store is not None:
+            self.event_store.upsert(event_result, self.local_timezone)
+
+    def _booking_result(self, event_result, title, start_time, duration_minutes, attendees=None):
+        meet_link = None
+        if 'conferenceData' in event_result and 'entryPoints' in event_result['conferenceData']:
+            for entry in event_result['conferenceData']['entryPoints']:
+                if entry['entryPointType'] == 'video':
+                    meet_link = entry['uri']
+                    break
+        
+        return {
+            'success': True,
+            'event_id': event_result['id'],
+            'html_link': event_result.get('htmlLink', ''),
+            'meet_link': meet_link,
+            'calendar_link': event_result.get('htmlLink', ''),
+            'created': event_result.get('created'),
+            'message': f"Meeting '{title}' booked successfully",
+            'details': {
+                'title': title,
+                'start_time': start_time.strftime('%Y-%m-%d %H:%M'),
+                'duration': duration_minutes,
+                'attendees_count': len(attendees) if attendees else 0
+            }
+        }
+
     def book_appointment(self, datetime_str: str, duration_minutes: int, title: str, description: str = "", add_meet_link: bool = True, attendees: list = None):
         try:
             if not self.service:
                 self.authenticate()
             
-            print(f"Scheduling: {title} at {datetime_str} for {duration_minutes} minutes")
+            logger.debug("Scheduling: %s at %s for %d minutes", title, datetime_str, duration_minutes)
             
             if datetime_str.endswith('+05:30') or datetime_str.endswith('+00:00'):
                 start_time = datetime.fromisoformat(datetime_str)
@@ -289,70 +639,323 @@ class CalendarService:
             
             end_time = start_time + timedelta(minutes=duration_minutes)
             
-            event = {
-                'summary': title,
-                'description': description,
-                'start': {
-                    'dateTime': start_time.isoformat(),
-                    'timeZone': str(start_time.tzinfo),
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': str(end_time.tzinfo),
-                },
-            }
-            
-            if add_meet_link:
-                event['conferenceData'] = {
-                    'createRequest': {
-                        'requestId': f"meet-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-                        'conferenceSolutionKey': {
-                            'type': 'hangoutsMeet'
-                        }
-                    }
-                }
-            
-            if attendees:
-                event['attendees'] = [{'email': email} for email in attendees]
+            event = self._build_event_body(start_time, end_time, title, description, add_meet_link, attendees)
             
-            event_result = self.service.events().insert(
+            # Not idempotent: only rate-limit rejections are retried, never a 5xx
+            # that may have created the event anyway
+            event_result = self.executor.execute(self.service.events().insert(
                 calendarId='primary', 
                 body=event,
                 conferenceDataVersion=1 if add_meet_link else 0,
                 sendUpdates='all' if attendees else 'none'
-            ).execute()
-            
-            print(f"Successfully created event: {event_result.get('id')}")
+            ), idempotent=False)
             
-            meet_link = None
-            if 'conferenceData' in event_result and 'entryPoints' in event_result['conferenceData']:
-                for entry in event_result['conferenceData']['entryPoints']:
-                    if entry['entryPointType'] == 'video':
-                        meet_link = entry['uri']
-                        break
+            logger.info("Created event %s", event_result.get('id'))
             
-            self.service = None
+            self._record_created_event(event_result, start_time, end_time, attendees)
             
-            return {
-                'success': True,
-                'event_id': event_result['id'],
-                'html_link': event_result.get('htmlLink', ''),
-                'meet_link': meet_link,
-                'calendar_link': event_result.get('htmlLink', ''),
-                'message': f"Meeting '{title}' booked successfully",
-                'details': {
-                    'title': title,
-                    'start_time': start_time.strftime('%Y-%m-%d %H:%M'),
-                    'duration': duration_minutes,
-                    'attendees_count': len(attendees) if attendees else 0
-                }
-            }
+            return self._booking_result(event_result, title, start_time, duration_minutes, attendees)
             
         except Exception as e:
-            print(f"Booking error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Booking error")
             return {
                 'success': False,
                 'message': f"Booking failed: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+    def book_many(self, bookings, check_availability: bool = True):
+        """Create several events using Google batch requests.
+
+        ``bookings`` are dicts with ``datetime``, ``duration``, ``title``,
+        ``description``, ``add_meet_link`` and ``attendees`` keys. Inserts are
+        grouped into batches of BATCH_BOOKING_CHUNK_SIZE (Google allows 50 per
+        Calendar batch). With ``check_availability`` every slot is validated
+        against one busy index covering the whole batch and against bookings in
+        flight, including earlier items of the same batch. Each slot is claimed
+        until its insert returns and then race-checked like book_if_free.
+        Returns one result per booking, in order.
+        """
+        if not self.service:
+            self.authenticate()
+        
+        results = [None] * len(bookings)
+        prepared = []
+        for position, booking in enumerate(bookings):
+            try:
+                start_time = self._parse_local_datetime(booking['datetime'])
+                duration_minutes = int(booking.get('duration', 60))
+                if duration_minutes <= 0:
+                    raise ValueError("duration must be positive")
+            except (KeyError, TypeError, ValueError) as e:
+                results[position] = {'success': False, 'message': f"Booking failed: invalid booking ({str(e)})"}
+                continue
+            prepared.append((position, start_time, start_time + timedelta(minutes=duration_minutes), duration_minutes, booking))
+        
+        busy_index = None
+        if check_availability and prepared:
+            try:
+                busy_index = self.get_busy_index(min(item[1] for item in prepared), max(item[2] for item in prepared))
+            except Exception as e:
+                logger.exception("Error checking availability for batch")
+                for position, *_ in prepared:
+                    results[position] = {'success': False, 'message': f"Booking failed: could not verify availability ({str(e)})"}
+                return results
+        
+        # Claim every slot in the in-flight table, as book_if_free does, so a concurrent
+        # single booking (or another batch) can't take the same slot meanwhile
+        claims = {}
+        with self._booking_lock:
+            accepted = []
+            for item in prepared:
+                position, start_time, end_time = item[0], item[1], item[2]
+                start_ts, end_ts = start_time.timestamp(), end_time.timestamp()
+                if busy_index is not None and (
+                    any(start < end_ts and end > start_ts for start, end in self._pending_bookings.values())
+                    or not busy_index.is_free_ts(start_ts, end_ts)
+                ):
+                    results[position] = {
+                        'success': False,
+                        'conflict': True,
+                        'message': f"Time slot {start_time.strftime('%H:%M')} on {start_time.strftime('%Y-%m-%d')} is already booked."
+                    }
+                    continue
+                claims[position] = claim = object()
+                self._pending_bookings[claim] = (start_ts, end_ts)
+                accepted.append(item)
+            prepared = accepted
+        
+        def release(position):
+            with self._booking_lock:
+                self._pending_bookings.pop(claims.pop(position, None), None)
+        
+        inserted = []
+        try:
+            chunk_size = int(os.getenv('BATCH_BOOKING_CHUNK_SIZE', 50))
+            for chunk_start in range(0, len(prepared), chunk_size):
+                chunk = {str(item[0]): item for item in prepared[chunk_start:chunk_start + chunk_size]}
+                
+                def handle_response(request_id, response, exception, chunk=chunk):
+                    position, start_time, end_time, duration_minutes, booking = chunk[request_id]
+                    title = booking.get('title', 'Meeting')
+                    release(position)
+                    if exception is not None:
+                        logger.warning("Batch booking error for item %d: %s", position, exception)
+                        results[position] = {'success': False, 'message': f"Booking failed: {str(exception)}"}
+                        return
+                    self._record_created_event(response, start_time, end_time, booking.get('attendees'))
+                    results[position] = self._booking_result(response, title, start_time, duration_minutes, booking.get('attendees'))
+                    inserted.append(chunk[request_id])
+                
+                requests = {}
+                for request_id, (position, start_time, end_time, duration_minutes, booking) in chunk.items():
+                    add_meet_link = booking.get('add_meet_link', True)
+                    attendees = booking.get('attendees') or []
+                    requests[request_id] = self.service.events().insert(
+                        calendarId='primary',
+                        body=self._build_event_body(
+                            start_time, end_time, booking.get('title', 'Meeting'),
+                            booking.get('description', ''), add_meet_link, attendees
+                        ),
+                        conferenceDataVersion=1 if add_meet_link else 0,
+                        sendUpdates='all' if attendees else 'none'
+                    )
+                
+                try:
+                    # Items Google throttles individually are re-batched with backoff
+                    self.executor.execute_batch(self.service.new_batch_http_request, requests, handle_response)
+                except Exception as e:
+                    logger.exception("Batch booking request failed")
+                    for request_id, item in chunk.items():
+                        if results[item[0]] is None:
+                            results[item[0]] = {'success': False, 'message': f"Booking failed: {str(e)}"}
+        finally:
+            for position in list(claims):
+                release(position)
+        
+        # Same optimistic race check as book_if_free, once the batch calls are done,
+        # with a single listing over the batch's span
+        statuses = self._verify_inserts(
+            [(results[position], start_time, end_time, booking.get('attendees'))
+             for position, start_time, end_time, duration_minutes, booking in inserted]
+        ) if inserted else []
+        for (position, start_time, end_time, duration_minutes, booking), status in zip(inserted, statuses):
+            if status == 'conflict':
+                results[position] = {
+                    'success': False,
+                    'conflict': True,
+                    'message': f"Time slot {start_time.strftime('%H:%M')} on {start_time.strftime('%Y-%m-%d')} is already booked."
+                }
+        
+        logger.info("Batch booking: %d/%d created", sum(1 for result in results if result and result['success']), len(bookings))
+        return results
+
+    def _parse_local_datetime(self, value: str):
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = self.local_timezone.localize(parsed)
+        return parsed
+
+    def book_if_free(self, datetime_str: str, duration_minutes: int, title: str, description: str = "", add_meet_link: bool = True, attendees: list = None, known_free: bool = False,
+                     verify_mode: str = None):
+        """Book a slot only if it is free, in one Google round trip when the busy index is warm.
+
+        The slot is validated against the local busy index (mirror or cached
+        window) and against bookings still in flight in this process, then
+        inserted. Because the local view can lag other writers, the insert is
+        followed by an optimistic check: if an overlapping event created before
+        ours shows up, our event is deleted. By default that check runs in the
+        background, the result carries ``verification: pending`` and
+        booking_status() reports the outcome; BOOKING_VERIFY_AFTER_INSERT=true
+        runs it before returning (reporting a conflict), false skips it.
+        ``verify_mode`` overrides that setting for callers that can't report
+        a later rollback, such as a chat turn.
+        
+        ``known_free`` marks a slot taken from a fresh free-slot list; only the
+        slot's own window is rechecked instead of the whole business day.
+        """
+        try:
+            start_time = self._parse_local_datetime(datetime_str)
+        except ValueError as e:
+            return {'success': False, 'message': f"Booking failed: {str(e)}"}
+        end_time = start_time + timedelta(minutes=duration_minutes)
+        start_ts, end_ts = start_time.timestamp(), end_time.timestamp()
+        conflict = {
+            'success': False,
+            'conflict': True,
+            'message': f"Time slot {start_time.strftime('%H:%M')} on {start_time.strftime('%Y-%m-%d')} is already booked. Please choose a different time."
+        }
+        
+        # Fetch the whole business day so follow-up checks on it are served from cache
+        day_start, day_end = self._business_window(start_time.astimezone(self.local_timezone).date())
+        if known_free or not (day_start <= start_time and end_time <= day_end):
+            day_start, day_end = start_time, end_time
+        try:
+            bitmap = self.get_day_bitmap(day_start, day_end)
+        except Exception as e:
+            logger.exception("Error checking availability")
+            return {'success': False, 'message': f"Booking failed: could not verify availability ({str(e)})"}
+        
+        with self._booking_lock:
+            in_flight = any(start < end_ts and end > start_ts for start, end in self._pending_bookings.values())
+            if in_flight or not bitmap.is_free_ts(start_ts, end_ts):
+                logger.info("Time slot unavailable: %s", datetime_str)
+                return conflict
+            claim = object()
+            self._pending_bookings[claim] = (start_ts, end_ts)
+        
+        try:
+            result = self.book_appointment(
+                datetime_str=start_time.isoformat(),
+                duration_minutes=duration_minutes,
+                title=title,
+                description=description,
+                add_meet_link=add_meet_link,
+                attendees=attendees
+            )
+        finally:
+            with self._booking_lock:
+                self._pending_bookings.pop(claim, None)
+        
+        if result['success'] and self._verify_after_insert(result, start_time, end_time, attendees, verify_mode) == 'conflict':
+            return conflict
+        
+        return result
+
+    def _verify_after_insert(self, result, start_time, end_time, attendees=None, verify_mode=None):
+        """Run (or schedule) the race check for a fresh insert; returns its status"""
+        return self._verify_inserts([(result, start_time, end_time, attendees)], verify_mode)[0]
+
+    def _verify_inserts(self, inserts, verify_mode=None):
+        """Race-check fresh inserts, given as (result, start, end, attendees), with one listing; a status each"""
+        verify_mode = verify_mode or self.verify_mode
+        bookings = [(result['event_id'], result.get('created'), start_time, end_time, attendees)
+                    for result, start_time, end_time, attendees in inserts]
+        if verify_mode == 'true':
+            statuses = self._verify_bookings(bookings)
+        elif verify_mode == 'background':
+            statuses = ['pending'] * len(bookings)
+            for booking in bookings:
+                self._set_booking_status(booking[0], 'pending')
+            # Carry the request's log correlation IDs into the verifier thread
+            context = contextvars.copy_context()
+            self._verifier().submit(context.run, self._verify_bookings, bookings)
+        else:
+            return [None] * len(inserts)
+        for (result, *_), status in zip(inserts, statuses):
+            result['verification'] = status
+        return statuses
+
+    def _verifier(self):
+        if self._verify_pool is None:
+            with self._booking_lock:
+                if self._verify_pool is None:
+                    self._verify_pool = ThreadPoolExecutor(max_workers=int(os.getenv('BOOKING_VERIFY_WORKERS', 2)),
+                                                           thread_name_prefix='booking-verify')
+        return self._verify_pool
+
+    def _verify_bookings(self, bookings):
+        """Roll back the bookings that lost a race; confirmed, conflict or unverified for each"""
+        statuses = []
+        for (event_id, created, start_time, end_time, attendees), lost in zip(bookings, self._lost_booking_races(bookings)):
+            if lost:
+                # Attendees get Google's cancellation notice; the organizer sees it via booking_status()
+                self._delete_event(event_id, start_time, end_time, attendees)
+                status = 'conflict'
+            else:
+                status = 'unverified' if lost is None else 'confirmed'
+            self._set_booking_status(event_id, status)
+            statuses.append(status)
+        return statuses
+
+    def _set_booking_status(self, event_id, status):
+        with self._booking_status_lock:
+            self._booking_status[event_id] = status
+            self._booking_status.move_to_end(event_id)
+            while len(self._booking_status) > int(os.getenv('BOOKING_STATUS_MAX_ENTRIES', 10000)):
+                self._booking_status.popitem(last=False)
+
+    def booking_status(self, event_id):
+        """Race-check outcome of a recent booking: pending, confirmed, conflict, unverified or None"""
+        with self._booking_status_lock:
+            return self._booking_status.get(event_id)
+
+    def _lost_booking_races(self, bookings):
+        """Per booking, True if another busy event overlapping it was created first, None if the check failed.
+
+        One events().list over the span of all ``bookings`` serves every check,
+        so a batch is verified with one call rather than one per item.
+        """
+        try:
+            events, _ = self._list_events(min(booking[2] for booking in bookings), max(booking[3] for booking in bookings))
+        except Exception as e:
+            # The inserts succeeded; don't undo them just because verification failed
+            logger.warning("Post-booking conflict check failed: %s", e)
+            return [None] * len(bookings)
+        
+        busy = [event for event in events if blocks_time(event)]
+        lost = []
+        for event_id, created, start_time, end_time, _ in bookings:
+            start_ts, end_ts = start_time.timestamp(), end_time.timestamp()
+            winner = next((
+                event for event in busy
+                if event.get('id') != event_id and self._overlaps(event, start_ts, end_ts)
+                and (not created or (event.get('created') or '', event['id']) < (created, event_id))
+            ), None)
+            if winner is not None:
+                logger.info("Booking %s lost a race with event %s", event_id, winner['id'])
+            lost.append(winner is not None)
+        return lost
+
+    def _delete_event(self, event_id, start_time, end_time, attendees=None):
+        try:
+            self.executor.execute(self.service.events().delete(
+                calendarId='primary',
+                eventId=event_id,
+                sendUpdates='all' if attendees else 'none'
+            ))
+        except Exception as e:
+            logger.error("Failed to roll back event %s: %s", event_id, e)
+        for calendar_id in ['primary'] + list(attendees or []):
+            self.event_cache.invalidate(calendar_id, start_time.timestamp(), end_time.timestamp())
+        if self.event_store is not None:
+            self.event_store.upsert({'id': event_id, 'status': 'cancelled'}, self.local_timezone)
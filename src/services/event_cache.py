@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .availability import BusyIntervalIndex
+from .metrics import EVENT_CACHE_LOOKUPS
+
+
+class CachedWindow:
+    """Busy data fetched for one calendar over one time window"""
+
+    __slots__ = ('source', 'calendar_id', 'start_ts', 'end_ts', 'index', 'events', 'sync_token', 'fetched_at')
+
+    def __init__(self, source: str, calendar_id: str, start_ts: float, end_ts: float,
+                 index: BusyIntervalIndex, events: Optional[Dict[str, Dict]] = None,
+                 sync_token: Optional[str] = None):
+        self.source = source
+        self.calendar_id = calendar_id
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.index = index
+        # Raw events by id; only kept for events().list windows so syncToken deltas can be applied
+        self.events = events
+        self.sync_token = sync_token
+        self.fetched_at = time.monotonic()
+
+    @property
+    def key(self) -> Tuple[str, str, float, float]:
+        return (self.source, self.calendar_id, self.start_ts, self.end_ts)
+
+    def covers(self, calendar_id: str, start_ts: float, end_ts: float) -> bool:
+        return self.calendar_id == calendar_id and self.start_ts <= start_ts and end_ts <= self.end_ts
+
+
+class EventWindowCache:
+    """Thread-safe LRU cache of calendar windows with a short TTL.
+
+    A fresh window answers any query for the same calendar that it fully
+    contains, so checking a day and then booking a slot on it costs one
+    fetch. Bookings made here are written into overlapping windows; other
+    changes invalidate them, and windows that carry a syncToken are only
+    marked stale so the next read can pull a delta.
+    """
+
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('EVENT_CACHE_TTL_SECONDS', 60))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('EVENT_CACHE_MAX_ENTRIES', 256))
+        self._entries: 'OrderedDict[Tuple, CachedWindow]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def _is_fresh(self, entry: CachedWindow, now: float) -> bool:
+        return now - entry.fetched_at < self.ttl_seconds
+
+    def find_busy_index(self, calendar_id: str, start_ts: float, end_ts: float) -> Optional[BusyIntervalIndex]:
+        """Index from any fresh window covering the query, or None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            for key, entry in reversed(self._entries.items()):
+                if entry.covers(calendar_id, start_ts, end_ts) and self._is_fresh(entry, now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    EVENT_CACHE_LOOKUPS.inc(result='hit')
+                    return entry.index
+            self.misses += 1
+        EVENT_CACHE_LOOKUPS.inc(result='miss')
+        return None
+
+    def get_window(self, source: str, calendar_id: str, start_ts: float, end_ts: float) -> Optional[CachedWindow]:
+        """Exact window regardless of freshness, for syncToken refreshes"""
+        with self._lock:
+            return self._entries.get((source, calendar_id, start_ts, end_ts))
+
+    def put(self, entry: CachedWindow) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[entry.key] = entry
+            self._entries.move_to_end(entry.key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, calendar_id: str, start_ts: float, end_ts: float) -> int:
+        """Drop (or mark stale) every window of the calendar overlapping [start, end)"""
+        invalidated = 0
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.calendar_id != calendar_id or entry.end_ts <= start_ts or entry.start_ts >= end_ts:
+                    continue
+                if entry.sync_token:
+                    entry.fetched_at = float('-inf')
+                else:
+                    del self._entries[key]
+                invalidated += 1
+        return invalidated
+
+    def record_busy(self, calendar_id: str, start_ts: float, end_ts: float) -> int:
+        """Write a newly created event into every overlapping window of the calendar"""
+        updated = 0
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.calendar_id != calendar_id or entry.end_ts <= start_ts or entry.start_ts >= end_ts:
+                    continue
+                entry.index = BusyIntervalIndex(entry.index.intervals() + [(start_ts, end_ts)])
+                updated += 1
+        return updated
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,145 @@
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from .availability import BusyIntervalIndex, blocks_time, parse_event_time
+
+logger = logging.getLogger(__name__)
+
+
+class EventStore:
+    """Local mirror of one calendar's busy events.
+
+    Holds event id -> (start, end) epoch seconds for a bounded horizon,
+    plus the syncToken needed to pull the next delta. With a ``db_path`` the
+    mirror is persisted to SQLite and reloaded on start, so a restart
+    resumes with an incremental sync instead of a full one.
+    """
+
+    def __init__(self, calendar_id: str = 'primary', db_path: Optional[str] = None):
+        self.calendar_id = calendar_id
+        self.db_path = db_path
+        self.sync_token: Optional[str] = None
+        self.horizon_start = 0.0
+        self.horizon_end = 0.0
+        self.last_full_sync = 0.0
+        self.last_synced = 0.0
+        self._events: Dict[str, tuple] = {}
+        self._index: Optional[BusyIntervalIndex] = None
+        self._lock = threading.RLock()
+        self._db = None
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "calendar_id TEXT, id TEXT, start_ts REAL, end_ts REAL, PRIMARY KEY (calendar_id, id))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            "calendar_id TEXT PRIMARY KEY, sync_token TEXT, horizon_start REAL, horizon_end REAL, last_full_sync REAL)"
+        )
+        self._db.commit()
+
+        row = self._db.execute(
+            "SELECT sync_token, horizon_start, horizon_end, last_full_sync FROM sync_state WHERE calendar_id = ?",
+            (self.calendar_id,)
+        ).fetchone()
+        if row:
+            self.sync_token, self.horizon_start, self.horizon_end, self.last_full_sync = row
+            self._events = {
+                event_id: (start_ts, end_ts)
+                for event_id, start_ts, end_ts in self._db.execute(
+                    "SELECT id, start_ts, end_ts FROM events WHERE calendar_id = ?", (self.calendar_id,)
+                )
+            }
+            logger.info("Loaded %d mirrored events for %s from %s", len(self._events), self.calendar_id, self.db_path)
+
+    @property
+    def is_synced(self) -> bool:
+        return self.sync_token is not None
+
+    def covers(self, start_ts: float, end_ts: float) -> bool:
+        return self.is_synced and self.horizon_start <= start_ts and end_ts <= self.horizon_end
+
+    def replace_all(self, events: Iterable[Dict], sync_token: Optional[str], horizon_start: float,
+                    horizon_end: float, local_timezone) -> None:
+        """Reset the mirror from a full listing"""
+        with self._lock:
+            self._events = {}
+            self.horizon_start = horizon_start
+            self.horizon_end = horizon_end
+            self._apply(events, local_timezone)
+            self.sync_token = sync_token
+            self.last_full_sync = self.last_synced = time.time()
+            self._persist(full=True)
+
+    def apply_changes(self, events: Iterable[Dict], sync_token: Optional[str], local_timezone) -> None:
+        """Apply an incremental syncToken delta"""
+        with self._lock:
+            changed = self._apply(events, local_timezone)
+            self.sync_token = sync_token
+            self.last_synced = time.time()
+            self._persist(changed=changed)
+
+    def upsert(self, event: Dict, local_timezone) -> None:
+        """Write-through of an event this process just created"""
+        with self._lock:
+            self._persist(changed=self._apply([event], local_timezone))
+
+    def _apply(self, events: Iterable[Dict], local_timezone) -> set:
+        changed = set()
+        for event in events:
+            event_id = event.get('id')
+            if not event_id:
+                continue
+            changed.add(event_id)
+            self._events.pop(event_id, None)
+            if not blocks_time(event):
+                continue
+            try:
+                start_ts = parse_event_time(event['start'], local_timezone).timestamp()
+                end_ts = parse_event_time(event['end'], local_timezone).timestamp()
+            except (KeyError, ValueError):
+                continue
+            if end_ts > self.horizon_start and start_ts < self.horizon_end:
+                self._events[event_id] = (start_ts, end_ts)
+        if changed:
+            self._index = None
+        return changed
+
+    def _persist(self, full: bool = False, changed: Iterable[str] = ()) -> None:
+        if self._db is None:
+            return
+        with self._db:
+            if full:
+                self._db.execute("DELETE FROM events WHERE calendar_id = ?", (self.calendar_id,))
+                changed = self._events.keys()
+            else:
+                self._db.executemany(
+                    "DELETE FROM events WHERE calendar_id = ? AND id = ?",
+                    [(self.calendar_id, event_id) for event_id in changed]
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO events (calendar_id, id, start_ts, end_ts) VALUES (?, ?, ?, ?)",
+                [(self.calendar_id, event_id, *self._events[event_id]) for event_id in changed if event_id in self._events]
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, horizon_start, horizon_end, last_full_sync) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.calendar_id, self.sync_token, self.horizon_start, self.horizon_end, self.last_full_sync)
+            )
+
+    def busy_index(self) -> BusyIntervalIndex:
+        """Index over every mirrored busy event, rebuilt only after changes"""
+        with self._lock:
+            if self._index is None:
+                self._index = BusyIntervalIndex(self._events.values())
+            return self._index
+
+    def __len__(self) -> int:
+        return len(self._events)
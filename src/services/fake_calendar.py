@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httplib2
+import pytz
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+
+def _http_error(status: int, reason: str) -> HttpError:
+    content = json.dumps({'error': {'code': status, 'errors': [{'reason': reason}]}}).encode()
+    return HttpError(httplib2.Response({'status': status}), content)
+
+
+def _timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def _rfc3339(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+class _FakeRequest:
+    """Stands in for googleapiclient's HttpRequest: the work runs on execute()"""
+
+    def __init__(self, backend: 'FakeCalendarBackend', handler, kwargs: Dict, method_id: str = None):
+        self.backend = backend
+        self.handler = handler
+        self.kwargs = kwargs
+        self.methodId = method_id
+
+    def execute(self, num_retries: int = 0):
+        self.backend.simulate_network()
+        return self.handler(**self.kwargs)
+
+
+class _FakeBatch:
+    def __init__(self, backend: 'FakeCalendarBackend', callback):
+        self.backend = backend
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request: _FakeRequest, request_id: str = None):
+        self.requests.append((request_id or str(len(self.requests)), request))
+
+    def execute(self):
+        # One round trip for the whole batch; items succeed, fail or get throttled individually
+        self.backend.simulate_network()
+        for request_id, request in self.requests:
+            try:
+                self.backend.simulate_item_rate_limit()
+                response, exception = request.handler(**request.kwargs), None
+            except HttpError as e:
+                response, exception = None, e
+            self.callback(request_id, response, exception)
+
+
+class _Resource:
+    def __init__(self, backend: 'FakeCalendarBackend', resource: str, **handlers):
+        self.backend = backend
+        self.resource = resource
+        self.handlers = handlers
+
+    def __getattr__(self, name):
+        handler = self.handlers.get(name)
+        if handler is None:
+            raise AttributeError(name)
+        return lambda **kwargs: _FakeRequest(self.backend, handler, kwargs, f"calendar.{self.resource}.{name}")
+
+
+class FakeCalendarBackend:
+    """In-memory Calendar API (events list/insert/delete, FreeBusy, batches).
+
+    Stands in for the discovery client so the API and agent can be driven
+    offline. Every calendar id is seeded on first use with
+    FAKE_CALENDAR_EVENTS_PER_DAY busy events per weekday, from a RNG keyed
+    on FAKE_CALENDAR_SEED and the calendar id, so runs are reproducible.
+    Each call sleeps FAKE_CALENDAR_LATENCY_MS (± FAKE_CALENDAR_LATENCY_JITTER_MS)
+    and fails with a 503 or 429 at FAKE_CALENDAR_ERROR_RATE /
+    FAKE_CALENDAR_RATE_LIMIT_RATE. Calendars listed in
+    FAKE_CALENDAR_UNKNOWN_IDS answer FreeBusy with notFound.
+    """
+
+    def __init__(self, seed: int = None, events_per_day: float = None, horizon_days: int = None,
+                 latency_ms: float = None, latency_jitter_ms: float = None,
+                 error_rate: float = None, rate_limit_rate: float = None):
+        self.seed = int(os.getenv('FAKE_CALENDAR_SEED', 42)) if seed is None else seed
+        self.events_per_day = float(os.getenv('FAKE_CALENDAR_EVENTS_PER_DAY', 4)) if events_per_day is None else events_per_day
+        self.horizon_days = int(os.getenv('FAKE_CALENDAR_HORIZON_DAYS', 60)) if horizon_days is None else horizon_days
+        self.latency_ms = float(os.getenv('FAKE_CALENDAR_LATENCY_MS', 0)) if latency_ms is None else latency_ms
+        self.latency_jitter_ms = (float(os.getenv('FAKE_CALENDAR_LATENCY_JITTER_MS', 0))
+                                  if latency_jitter_ms is None else latency_jitter_ms)
+        self.error_rate = float(os.getenv('FAKE_CALENDAR_ERROR_RATE', 0)) if error_rate is None else error_rate
+        self.rate_limit_rate = float(os.getenv('FAKE_CALENDAR_RATE_LIMIT_RATE', 0)) if rate_limit_rate is None else rate_limit_rate
+        self.unknown_ids = {
+            calendar_id.strip().lower()
+            for calendar_id in os.getenv('FAKE_CALENDAR_UNKNOWN_IDS', '').split(',') if calendar_id.strip()
+        }
+        self.local_timezone = pytz.timezone(os.getenv('TIMEZONE', 'Asia/Kolkata'))
+        self._lock = threading.Lock()
+        self._faults = random.Random(self.seed)
+        # calendar id -> event id -> (start_ts, end_ts, event)
+        self._calendars: Dict[str, Dict[str, tuple]] = {}
+        # Change log for syncToken: (sequence, calendar id, event id)
+        self._changes: List[tuple] = []
+        self._sequence = 0
+        self.calls = 0
+
+    def simulate_network(self) -> None:
+        with self._lock:
+            self.calls += 1
+            latency = self.latency_ms + self._faults.uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+            roll = self._faults.random()
+        if latency > 0:
+            time.sleep(latency / 1000)
+        if roll < self.rate_limit_rate:
+            raise _http_error(429, 'rateLimitExceeded')
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise _http_error(503, 'backendError')
+
+    def simulate_item_rate_limit(self) -> None:
+        """Google counts each batch item against the quota, so items can be throttled alone"""
+        with self._lock:
+            roll = self._faults.random()
+        if roll < self.rate_limit_rate:
+            raise _http_error(429, 'rateLimitExceeded')
+
+    # Seeding
+
+    def _calendar(self, calendar_id: str) -> Dict[str, tuple]:
+        """Events of a calendar, seeded on first use; caller holds the lock"""
+        events = self._calendars.get(calendar_id)
+        if events is None:
+            events = self._calendars[calendar_id] = {}
+            for event in self._seed_events(calendar_id):
+                self._store(calendar_id, event, log=False)
+        return events
+
+    def _seed_events(self, calendar_id: str) -> List[Dict]:
+        rng = random.Random(f"{self.seed}:{calendar_id}")
+        today = datetime.now(self.local_timezone).date()
+        events = []
+        for offset in range(-1, self.horizon_days + 1):
+            day = today + timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            count = int(self.events_per_day) + (rng.random() < self.events_per_day % 1)
+            for _ in range(count):
+                start = self.local_timezone.localize(datetime.combine(day, datetime.min.time())) + timedelta(
+                    minutes=rng.randrange(8 * 60, 20 * 60, 30)
+                )
+                end = start + timedelta(minutes=rng.choice((30, 30, 45, 60, 60, 90)))
+                event = self._event_body(start.isoformat(), end.isoformat(), 'Busy', rng.random() < 0.1)
+                event['id'] = f"seed{rng.getrandbits(64):016x}"
+                event['created'] = '2000-01-01T00:00:00.000Z'
+                events.append(event)
+        return events
+
+    @staticmethod
+    def _event_body(start: str, end: str, summary: str, transparent: bool = False) -> Dict:
+        event = {'status': 'confirmed', 'summary': summary, 'start': {'dateTime': start}, 'end': {'dateTime': end}}
+        if transparent:
+            event['transparency'] = 'transparent'
+        return event
+
+    def _store(self, calendar_id: str, event: Dict, log: bool = True) -> None:
+        self._calendars[calendar_id][event['id']] = (
+            _timestamp(event['start']['dateTime']), _timestamp(event['end']['dateTime']), event
+        )
+        if log:
+            self._sequence += 1
+            self._changes.append((self._sequence, calendar_id, event['id']))
+
+    # events()
+
+    def list_events(self, calendarId='primary', timeMin=None, timeMax=None, syncToken=None,
+                    pageToken=None, maxResults=250, **_ignored):
+        with self._lock:
+            events = self._calendar(calendarId)
+            if syncToken:
+                since = int(syncToken)
+                changed = dict.fromkeys(event_id for sequence, calendar_id, event_id in self._changes
+                                        if sequence > since and calendar_id == calendarId)
+                items = [events[event_id][2] for event_id in changed if event_id in events]
+            else:
+                low = _timestamp(timeMin) if timeMin else float('-inf')
+                high = _timestamp(timeMax) if timeMax else float('inf')
+                items = [event for start, end, event in sorted(events.values(), key=lambda item: item[0])
+                         if start < high and end > low and event.get('status') != 'cancelled']
+            sequence = self._sequence
+
+        offset = int(pageToken or 0)
+        page = items[offset:offset + maxResults]
+        result = {'items': [dict(event) for event in page]}
+        if offset + maxResults < len(items):
+            result['nextPageToken'] = str(offset + maxResults)
+        else:
+            result['nextSyncToken'] = str(sequence)
+        return result
+
+    def insert_event(self, calendarId='primary', body=None, conferenceDataVersion=0, **_ignored):
+        body = body or {}
+        event = self._event_body(body['start']['dateTime'], body['end']['dateTime'],
+                                 body.get('summary', ''), body.get('transparency') == 'transparent')
+        event_id = body.get('id') or uuid.uuid4().hex
+        event.update({
+            'id': event_id,
+            'description': body.get('description', ''),
+            'created': _rfc3339(time.time()),
+            'htmlLink': f"https://calendar.example.invalid/event?eid={event_id}",
+        })
+        if body.get('attendees'):
+            event['attendees'] = body['attendees']
+        if conferenceDataVersion and 'conferenceData' in body:
+            event['conferenceData'] = {'entryPoints': [
+                {'entryPointType': 'video', 'uri': f"https://meet.example.invalid/{event_id[:10]}"}
+            ]}
+        with self._lock:
+            events = self._calendar(calendarId)
+            if event_id in events:
+                raise _http_error(409, 'duplicate')
+            self._store(calendarId, event)
+        return dict(event)
+
+    def delete_event(self, calendarId='primary', eventId=None, **_ignored):
+        with self._lock:
+            stored = self._calendar(calendarId).get(eventId)
+            if stored is None or stored[2].get('status') == 'cancelled':
+                raise _http_error(410 if stored else 404, 'deleted' if stored else 'notFound')
+            self._store(calendarId, {**stored[2], 'status': 'cancelled'})
+        return ''
+
+    # freebusy()
+
+    def query_freebusy(self, body=None):
+        low, high = _timestamp(body['timeMin']), _timestamp(body['timeMax'])
+        calendars = {}
+        with self._lock:
+            for item in body.get('items', []):
+                calendar_id = item['id']
+                if calendar_id.lower() in self.unknown_ids:
+                    calendars[calendar_id] = {'errors': [{'domain': 'global', 'reason': 'notFound'}], 'busy': []}
+                    continue
+                busy = sorted(
+                    (max(start, low), min(end, high))
+                    for start, end, event in self._calendar(calendar_id).values()
+                    if start < high and end > low
+                    and event.get('status') != 'cancelled' and event.get('transparency') != 'transparent'
+                )
+                merged = []
+                for start, end in busy:
+                    if merged and start <= merged[-1][1]:
+                        merged[-1][1] = max(merged[-1][1], end)
+                    else:
+                        merged.append([start, end])
+                calendars[calendar_id] = {'busy': [{'start': _rfc3339(start), 'end': _rfc3339(end)} for start, end in merged]}
+        return {'kind': 'calendar#freeBusy', 'timeMin': body['timeMin'], 'timeMax': body['timeMax'], 'calendars': calendars}
+
+
+class FakeCalendarService:
+    """The slice of the discovery ``calendar`` v3 resource CalendarService uses"""
+
+    def __init__(self, backend: FakeCalendarBackend):
+        self.backend = backend
+
+    def events(self):
+        return _Resource(self.backend, 'events', list=self.backend.list_events,
+                         insert=self.backend.insert_event, delete=self.backend.delete_event)
+
+    def freebusy(self):
+        return _Resource(self.backend, 'freebusy', query=self.backend.query_freebusy)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self.backend, callback)
+
+
+class FakeCalendarClient:
+    """Drop-in for GoogleCalendarClient backed by FakeCalendarBackend (CALENDAR_BACKEND=memory)"""
+
+    def __init__(self, backend: Optional[FakeCalendarBackend] = None):
+        self.backend = backend or FakeCalendarBackend()
+        self.service = FakeCalendarService(self.backend)
+        logger.info("Using in-memory calendar backend (seed %s, %g events/day, %gms latency)",
+                    self.backend.seed, self.backend.events_per_day, self.backend.latency_ms)
+
+    def close(self):
+        pass
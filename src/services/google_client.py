@@ -0,0 +1,229 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+import google_auth_httplib2
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest
+from dotenv import load_dotenv
+
+from .request_executor import http_timeout_seconds
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+
+def _create_credentials_from_env():
+    credentials_data = {
+        "installed": {
+            "client_id": os.getenv('GOOGLE_CLIENT_ID'),
+            "project_id": os.getenv('GOOGLE_PROJECT_ID'),
+            "auth_uri": os.getenv('GOOGLE_AUTH_URI', 'https://accounts.google.com/o/oauth2/auth'),
+            "token_uri": os.getenv('GOOGLE_TOKEN_URI', 'https://oauth2.googleapis.com/token'),
+            "auth_provider_x509_cert_url": os.getenv('GOOGLE_AUTH_PROVIDER_X509_CERT_URL', 'https://www.googleapis.com/oauth2/v1/certs'),
+            "client_secret": os.getenv('GOOGLE_CLIENT_SECRET'),
+            "redirect_uris": [os.getenv('GOOGLE_REDIRECT_URIS', 'http://localhost')]
+        }
+    }
+
+    required_fields = ['client_id', 'client_secret', 'project_id']
+    missing_fields = [field for field in required_fields if not credentials_data['installed'].get(field)]
+
+    if missing_fields:
+        raise ValueError(f"Missing required Google OAuth environment variables: {', '.join(missing_fields)}")
+
+    return credentials_data
+
+
+class GoogleCalendarClient:
+    """Long-lived, thread-safe holder for the Calendar API client.
+
+    Credentials are loaded once and refreshed on a background timer shortly
+    before they expire, and the discovery client is built once and shared by
+    every CalendarService. httplib2 connections are not thread-safe, so each
+    worker thread gets its own authorized connection over the shared
+    credentials instead of one global transport.
+    """
+
+    def __init__(self, scopes=None, token_file=None):
+        self.scopes = scopes or SCOPES
+        self.token_file = token_file or os.getenv('GOOGLE_TOKEN_FILE', 'token.json')
+        self.refresh_margin_seconds = int(os.getenv('GOOGLE_TOKEN_REFRESH_MARGIN_SECONDS', 300))
+        self.refresh_retry_seconds = int(os.getenv('GOOGLE_TOKEN_REFRESH_RETRY_SECONDS', 60))
+        self.http_timeout_seconds = http_timeout_seconds()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._credentials = None
+        self._service = None
+        self._refresh_timer = None
+
+    @property
+    def credentials(self):
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    self._credentials = self._load_credentials()
+                    self._schedule_refresh()
+        return self._credentials
+
+    @property
+    def service(self):
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = build(
+                        'calendar', 'v3',
+                        http=self.http(),
+                        requestBuilder=self._build_request,
+                        cache_discovery=False
+                    )
+                    logger.info("Google Calendar service initialized")
+        return self._service
+
+    def http(self):
+        """Authorized HTTP connection for the calling thread"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=self.http_timeout_seconds)
+            )
+            self._local.http = http
+        return http
+
+    def _build_request(self, http, *args, **kwargs):
+        # The discovery client hands every request the connection it was built
+        # with; swap in the current thread's own connection instead.
+        return HttpRequest(self.http(), *args, **kwargs)
+
+    def _load_credentials(self):
+        creds = None
+
+        if os.path.exists(self.token_file):
+            creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+
+        if creds and creds.valid:
+            return creds
+
+        if creds and creds.expired and creds.refresh_token:
+            try:
+                creds.refresh(Request())
+                logger.info("Google Calendar token refreshed")
+            except Exception as e:
+                logger.warning("Token refresh failed: %s. Creating new credentials", e)
+                creds = None
+        else:
+            creds = None
+
+        if not creds:
+            creds = self._run_oauth_flow()
+
+        self._save_token(creds)
+        return creds
+
+    def _run_oauth_flow(self):
+        try:
+            credentials_data = _create_credentials_from_env()
+
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
+                json.dump(credentials_data, temp_file)
+                temp_credentials_path = temp_file.name
+
+            try:
+                flow = InstalledAppFlow.from_client_secrets_file(temp_credentials_path, self.scopes)
+                creds = flow.run_local_server(port=0)
+            finally:
+                os.unlink(temp_credentials_path)
+
+            logger.info("Google Calendar authenticated using environment variables")
+            return creds
+
+        except (ValueError, FileNotFoundError) as e:
+            logger.info("Environment variables not found or incomplete: %s", e)
+
+            if os.path.exists('credentials.json'):
+                logger.info("Falling back to credentials.json file")
+                flow = InstalledAppFlow.from_client_secrets_file('credentials.json', self.scopes)
+                creds = flow.run_local_server(port=0)
+                logger.info("Google Calendar authenticated using credentials.json")
+                return creds
+
+            raise Exception(
+                "No valid Google OAuth credentials found! "
+                "Please either:\n"
+                "1. Set environment variables (GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, etc.)\n"
+                "2. Place credentials.json in the project root"
+            )
+
+    def _save_token(self, creds):
+        with open(self.token_file, 'w') as token:
+            token.write(creds.to_json())
+
+    def _schedule_refresh(self, delay=None):
+        creds = self._credentials
+        if creds is None or not creds.refresh_token:
+            return
+
+        if delay is None:
+            if not creds.expiry:
+                return
+            # google-auth stores expiry as a naive UTC datetime
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            delay = max((creds.expiry - now).total_seconds() - self.refresh_margin_seconds, 0)
+
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+        self._refresh_timer = threading.Timer(delay, self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            try:
+                self._credentials.refresh(Request())
+                self._save_token(self._credentials)
+                logger.debug("Google Calendar token refreshed in background")
+                self._schedule_refresh()
+            except Exception as e:
+                logger.warning("Background token refresh failed: %s. Retrying in %ss", e, self.refresh_retry_seconds)
+                self._schedule_refresh(delay=self.refresh_retry_seconds)
+
+    def close(self):
+        with self._lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_calendar_client() -> GoogleCalendarClient:
+    """Process-wide client shared by every CalendarService.
+
+    CALENDAR_BACKEND=memory swaps Google for the in-memory fake in
+    fake_calendar.py, for offline load and latency testing.
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                backend = os.getenv('CALENDAR_BACKEND', 'google').lower()
+                if backend == 'memory':
+                    from .fake_calendar import FakeCalendarClient
+                    _default_client = FakeCalendarClient()
+                elif backend == 'google':
+                    _default_client = GoogleCalendarClient()
+                else:
+                    raise ValueError(f"Unknown CALENDAR_BACKEND: {backend} (expected google or memory)")
+    return _default_client
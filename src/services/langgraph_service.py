@@ -1,20 +1,30 @@
-from typing import Dict, Any, List, Optional
-import re
-from datetime import datetime, timedelta
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
+import hashlib
+import logging
+import sqlite3
 import sys
 import os
+import threading
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.runnables import RunnableConfig
 
 from .calendar_service import CalendarService
+from .logging_setup import session_id_var
+from .message_parser import parse_message
+from .metrics import NODE_DURATION
+from .response_formatter import build_payload, error_payload, render_markdown
 
 from typing_extensions import TypedDict
 from langchain_core.messages import BaseMessage
 
+logger = logging.getLogger(__name__)
+
 class SchedulingState(TypedDict):
     """State for the LangGraph scheduling conversation workflow"""
     messages: List[BaseMessage]
@@ -31,25 +41,77 @@ class SchedulingState(TypedDict):
     error: Optional[str]
     session_id: str
     next_action: str
+    quickbook: bool
+    # Slots last shown in this session: {'date', 'duration', 'fetched_at', 'version', 'slots'};
+    # after a booking only the day ('date', 'duration', 'fetched_at') is kept
+    slot_snapshot: Dict
+    # Structured form of ``response`` (see response_formatter)
+    response_payload: Dict
+    # "markdown" renders ``response``; "structured" leaves it empty for the client to render
+    response_format: str
+    # Emails named in the message and the ranked common time found for them
+    attendees: List[str]
+    common_time: Dict
 
 class LangGraphSchedulingAgent:
     """LangGraph implementation for conversational calendar booking"""
     
-    def __init__(self):
-        self.calendar_service = CalendarService()
+    def __init__(self, calendar_service: Optional[CalendarService] = None):
+        # Share the caller's CalendarService (and its client and caches) when given
+        self.calendar_service = calendar_service or CalendarService()
+        self.max_messages = int(os.getenv('CONVERSATION_MAX_MESSAGES', 20))
+        self.session_idle_seconds = float(os.getenv('CONVERSATION_IDLE_TIMEOUT_SECONDS', 1800))
+        self.slot_reuse_seconds = float(os.getenv('CONVERSATION_SLOT_REUSE_SECONDS', 60))
+        self.slot_snapshot_ttl = float(os.getenv('SLOT_SNAPSHOT_TTL_SECONDS', 300))
+        self.compact_every_turns = int(os.getenv('CONVERSATION_COMPACT_EVERY_TURNS', 10))
+        self.stream_chunk_size = max(1, int(os.getenv('STREAM_SLOT_CHUNK_SIZE', 8)))
+        # session_id -> [turn lock, last activity]
+        self._sessions: Dict[str, list] = {}
+        self._sessions_lock = threading.Lock()
+        self._last_eviction = time.monotonic()
+        self.checkpointer = self._create_checkpointer()
         self.workflow = self._create_workflow()
     
+    def _create_checkpointer(self):
+        """Conversation state store keyed by session_id (memory or SQLite)"""
+        backend = os.getenv('CONVERSATION_CHECKPOINTER', 'memory').lower()
+        if backend == 'sqlite':
+            try:
+                from langgraph.checkpoint.sqlite import SqliteSaver
+            except ImportError:
+                logger.warning("langgraph-checkpoint-sqlite is not installed, keeping conversations in memory")
+            else:
+                db_path = os.getenv('CONVERSATION_DB_PATH', 'conversations.db')
+                logger.info("Persisting conversations to %s", db_path)
+                return SqliteSaver(sqlite3.connect(db_path, check_same_thread=False))
+        return MemorySaver()
+    
+    @staticmethod
+    def _timed(name: str, node):
+        """Wrap a node so its latency lands in NODE_DURATION, outcome error when it sets state['error']"""
+        def run(state: SchedulingState) -> SchedulingState:
+            start = time.perf_counter()
+            outcome = 'exception'
+            try:
+                result = node(state)
+                outcome = 'error' if (result or {}).get('error') else 'ok'
+                return result
+            finally:
+                NODE_DURATION.observe(time.perf_counter() - start, node=name, outcome=outcome)
+        return run
+    
     def _create_workflow(self) -> StateGraph:
         """Create the LangGraph workflow with proper nodes and edges"""
-        print("Building LangGraph workflow...")
+        logger.debug("Building LangGraph workflow")
         
         workflow = StateGraph(SchedulingState)
         
-        workflow.add_node("extract_intent", self._extract_intent_node)
-        workflow.add_node("check_availability", self._check_availability_node)
-        workflow.add_node("book_appointment", self._book_appointment_node)
-        workflow.add_node("generate_response", self._generate_response_node)
-        workflow.add_node("handle_error", self._handle_error_node)
+        workflow.add_node("extract_intent", self._timed("extract_intent", self._extract_intent_node))
+        workflow.add_node("check_availability", self._timed("check_availability", self._check_availability_node))
+        workflow.add_node("find_common_time", self._timed("find_common_time", self._find_common_time_node))
+        workflow.add_node("book_appointment", self._timed("book_appointment", self._book_appointment_node))
+        workflow.add_node("generate_response", self._timed("generate_response", self._generate_response_node))
+        workflow.add_node("handle_error", self._timed("handle_error", self._handle_error_node))
         
         workflow.set_entry_point("extract_intent")
         
@@ -58,6 +120,7 @@ class LangGraphSchedulingAgent:
             self._route_after_intent,
             {
                 "check_availability": "check_availability",
+                "find_common_time": "find_common_time",
                 "book_directly": "book_appointment",
                 "generate_response": "generate_response",
                 "error": "handle_error"
@@ -74,302 +137,212 @@ class LangGraphSchedulingAgent:
             }
         )
         
-        workflow.add_edge("book_appointment", "generate_response")
+        workflow.add_conditional_edges(
+            "find_common_time",
+            self._route_after_common_time,
+            {
+                "show_slots": "generate_response",
+                "error": "handle_error"
+            }
+        )
+        
+        workflow.add_conditional_edges(
+            "book_appointment",
+            self._route_after_booking,
+            {
+                "confirm": "generate_response",
+                "error": "handle_error"
+            }
+        )
         workflow.add_edge("generate_response", END)
         workflow.add_edge("handle_error", END)
         
-        compiled_workflow = workflow.compile()
-        print("LangGraph workflow compiled successfully")
+        compiled_workflow = workflow.compile(checkpointer=self.checkpointer)
+        logger.info("LangGraph workflow compiled")
         
         return compiled_workflow
     
     def _extract_intent_node(self, state: SchedulingState) -> SchedulingState:
         """Extract intent from user message"""
         try:
-            print(f"Extracting intent from: {state['user_input']}")
+            logger.debug("Extracting intent from: %s", state['user_input'])
             
-            message = state['user_input'].lower()
+            parsed = parse_message(state['user_input'])
+            state['intent'] = parsed.intent
+            state['date'] = parsed.date
+            state['time'] = parsed.time
+            state['duration'] = parsed.duration
+            state['quickbook'] = parsed.quickbook
+            state['attendees'] = list(parsed.attendees)
             
-            if any(word in message for word in ['book', 'schedule', 'meeting', 'appointment', 'call']):
-                state['intent'] = 'book_appointment'
-            elif any(word in message for word in ['available', 'free', 'availability', 'check', 'when']):
-                state['intent'] = 'check_availability'
-            elif any(word in message for word in ['cancel', 'delete', 'remove']):
-                state['intent'] = 'cancel_appointment'
-            else:
-                state['intent'] = 'general_chat'
-            
-            state['date'] = self._extract_date(message)
-            state['time'] = self._extract_time(message)
-            state['duration'] = self._extract_duration(message)
+            # Follow-ups like "book the 3pm one" refer to the day whose slots were last shown,
+            # as long as that list is recent enough to still be what the user is looking at
+            snapshot = state.get('slot_snapshot') or {}
+            if (parsed.date_phrase is None and snapshot.get('date', '') >= parsed.date
+                    and time.time() - snapshot.get('fetched_at', 0) < self.slot_snapshot_ttl):
+                state['date'] = snapshot['date']
+                if not parsed.has_duration:
+                    state['duration'] = snapshot['duration']
             
-            if 'messages' not in state:
-                state['messages'] = []
-            state['messages'].append(HumanMessage(content=state['user_input']))
+            self._append_message(state, HumanMessage(content=state['user_input']))
             
-            print(f"Intent: {state['intent']}, Date: {state['date']}, Time: {state['time']}")
+            logger.debug("Intent: %s, Date: %s, Time: %s", state['intent'], state['date'], state['time'])
             
             return state
             
         except Exception as e:
             state['error'] = f"Error extracting intent: {str(e)}"
-            print(f"Intent extraction error: {state['error']}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Intent extraction failed")
             return state
     
     def _check_availability_node(self, state: SchedulingState) -> SchedulingState:
         """Check calendar availability"""
         try:
-            print(f"Checking availability for date: {state['date']}")
+            logger.debug("Checking availability for date: %s", state['date'])
             
-            available_slots = self.calendar_service.get_free_time_slots(state['date'], state['duration'])
+            snapshot = state.get('slot_snapshot') or {}
+            if (snapshot.get('version') and snapshot.get('date') == state['date'] and snapshot.get('duration') == state['duration']
+                    and time.time() - snapshot.get('fetched_at', 0) < self.slot_reuse_seconds):
+                logger.debug("Reusing slots from the previous turn")
+                available_slots = snapshot['slots']
+            else:
+                available_slots = self.calendar_service.get_free_time_slots(state['date'], state['duration'])
+                state['slot_snapshot'] = {
+                    'date': state['date'],
+                    'duration': state['duration'],
+                    'fetched_at': time.time(),
+                    'version': self._slots_version(state['date'], state['duration'], available_slots),
+                    'slots': available_slots
+                }
             state['available_slots'] = available_slots
             
-            print(f"Found {len(available_slots)} available slots")
+            logger.debug("Found %d available slots", len(available_slots))
             
             return state
             
         except Exception as e:
             state['error'] = f"Error checking availability: {str(e)}"
-            print(f"Availability check error: {state['error']}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Availability check failed")
+            return state
+    
+    def _find_common_time_node(self, state: SchedulingState) -> SchedulingState:
+        """Rank slots on the requested day by how many attendees are free"""
+        try:
+            logger.debug("Finding common time for %d attendees on %s", len(state['attendees']), state['date'])
+            
+            common_time = self.calendar_service.find_common_time(
+                state['attendees'], state['date'], duration_minutes=state['duration']
+            )
+            state['common_time'] = common_time
+            state['available_slots'] = common_time['slots']
+            
+            logger.debug("Found %d candidate slots", len(common_time['slots']))
+            
+            return state
+            
+        except Exception as e:
+            state['error'] = f"Error finding a common time: {str(e)}"
+            logger.exception("Common time lookup failed")
             return state
     
     def _book_appointment_node(self, state: SchedulingState) -> SchedulingState:
         """Book the appointment with availability check"""
         try:
-            print(f"Booking appointment for {state['date']} at {state['time']}")
+            logger.debug("Booking appointment for %s at %s", state['date'], state['time'])
             
             if state['time'] and state['date']:
                 datetime_str = f"{state['date']}T{state['time']}:00"
                 
-                from datetime import datetime, timedelta
-                import pytz
-                
-                if datetime_str.endswith('+05:30') or datetime_str.endswith('+00:00'):
-                    start_time = datetime.fromisoformat(datetime_str)
-                else:
-                    start_time = datetime.fromisoformat(datetime_str)
-                    local_tz = pytz.timezone('Asia/Kolkata')
-                    if start_time.tzinfo is None:
-                        start_time = local_tz.localize(start_time)
-                
-                end_time = start_time + timedelta(minutes=state['duration'])
-                
-                print(f"Checking availability for {start_time} to {end_time}")
-                
-                is_available = self.calendar_service.check_availability(
-                    start_time.isoformat(),
-                    end_time.isoformat()
-                )
-                
-                if not is_available:
-                    state['error'] = f"Time slot {state['time']} on {state['date']} is already booked. Please choose a different time."
-                    print(f"Time slot unavailable: {state['time']} on {state['date']}")
-                    return state
-                
-                print("Time slot is available, proceeding with booking...")
-                
-                result = self.calendar_service.book_appointment(
+                # Validates against the local busy index, inserts, then checks for a racing booking
+                result = self.calendar_service.book_if_free(
                     datetime_str=datetime_str,
                     duration_minutes=state['duration'],
                     title=state['meeting_title'],
-                    description="Scheduled via AI Calendar Assistant"
+                    description="Scheduled via AI Calendar Assistant",
+                    attendees=state.get('attendees') or None,
+                    known_free=self._snapshot_slot(state.get('slot_snapshot'), datetime_str, state['duration']) is not None,
+                    # The reply can't be amended later, so settle a lost race before confirming
+                    verify_mode='true' if self.calendar_service.verify_mode != 'false' else None
                 )
                 
+                if result.get('conflict'):
+                    state['error'] = f"Time slot {state['time']} on {state['date']} is already booked. Please choose a different time."
+                    logger.info("Time slot unavailable: %s on %s", state['time'], state['date'])
+                    return state
+                
                 if result['success']:
+                    # The booked slot is no longer free, but follow-ups still mean that day
+                    state['slot_snapshot'] = self._spent_snapshot(state.get('slot_snapshot'))
                     state['booking_confirmed'] = True
                     state['booking_details'] = {
                         'date': state['date'],
                         'time': state['time'],
                         'duration': state['duration'],
                         'title': state['meeting_title'],
-                        'event_link': result.get('html_link', '')
+                        'event_link': result.get('html_link', ''),
+                        'verification': result.get('verification')
                     }
-                    print("Booking successful")
+                    logger.debug("Booking successful")
                 else:
                     state['error'] = result['message']
-                    print(f"Booking failed: {state['error']}")
+                    logger.warning("Booking failed: %s", state['error'])
             else:
                 state['error'] = "Missing date or time for booking"
-                print(f"Missing booking info: {state['error']}")
+                logger.debug("Missing booking info: %s", state['error'])
             
             return state
             
         except Exception as e:
             state['error'] = f"Error booking appointment: {str(e)}"
-            print(f"Booking error: {state['error']}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Booking failed")
             return state
     
     def _generate_response_node(self, state: SchedulingState) -> SchedulingState:
         """Generate final response"""
         try:
-            print(f"Generating response for intent: {state['intent']}")
+            logger.debug("Generating response for intent: %s", state['intent'])
             
-            if state.get('booking_confirmed', False):
-                booking_details = state['booking_details']
-                response = f"Perfect! I've successfully booked your meeting:\n\n"
-                response += f"**Date:** {booking_details['date']}\n"
-                response += f"**Time:** {booking_details['time']}\n"
-                response += f"**Duration:** {booking_details['duration']} minutes\n"
-                response += f"**Title:** {booking_details['title']}\n"
-                
-                if booking_details.get('event_link'):
-                    response += f"\n[View in Google Calendar]({booking_details['event_link']})"
-                
-                response += f"\n\nYour appointment has been confirmed!"
-                
-            elif state['intent'] == 'book_appointment' and state.get('available_slots', []):
-                available_slots = state['available_slots']
-                
-                date_obj = datetime.strptime(state['date'], '%Y-%m-%d')
-                formatted_date = date_obj.strftime('%A, %B %d, %Y')
-                
-                requested_time = state.get('time')
-                if requested_time:
-                    response = f"I'd be happy to schedule a meeting for **{requested_time}** on **{formatted_date}**!\n\n"
-                    response += f"Here are the available time slots for that day. Please click on your preferred slot to book:\n\n"
-                else:
-                    response = f"I'd be happy to help you schedule a meeting on **{formatted_date}**!\n\n"
-                    response += f"Here are the available time slots. Please click on your preferred slot to book:\n\n"
-                
-                morning_slots = []
-                afternoon_slots = []
-                evening_slots = []
-                
-                for slot in available_slots:
-                    hour = int(slot['start_24'].split(':')[0])
-                    if hour < 12:
-                        morning_slots.append(slot)
-                    elif 12 <= hour < 17:
-                        afternoon_slots.append(slot)
-                    else:
-                        evening_slots.append(slot)
-                
-                if morning_slots:
-                    response += f"**Morning ({len(morning_slots)} slots):**\n"
-                    for slot in morning_slots:
-                        response += f"• {slot['start']} - {slot['end']}\n"
-                
-                if afternoon_slots:
-                    response += f"\n**Afternoon ({len(afternoon_slots)} slots):**\n"
-                    for slot in afternoon_slots:
-                        response += f"• {slot['start']} - {slot['end']}\n"
-                
-                if evening_slots:
-                    response += f"\n**Evening ({len(evening_slots)} slots):**\n"
-                    for slot in evening_slots:
-                        response += f"• {slot['start']} - {slot['end']}\n"
-                
-                response += f"\n**Total available slots: {len(available_slots)}**"
-                response += f"\n\nClick any slot below to open the booking form!"
-                
-                if requested_time:
-                    requested_time_available = False
-                    for slot in available_slots:
-                        if requested_time in slot['start'] or requested_time in slot['start_24']:
-                            requested_time_available = True
-                            break
-                    
-                    if requested_time_available:
-                        response += f"\n\nGood news! Your requested time ({requested_time}) is available!"
-                    else:
-                        response += f"\n\nSorry, your requested time ({requested_time}) is not available. Please choose from the available slots above."
-            
-            elif state['intent'] == 'check_availability' and state.get('available_slots', []):
-                available_slots = state['available_slots']
-                
-                date_obj = datetime.strptime(state['date'], '%Y-%m-%d')
-                formatted_date = date_obj.strftime('%A, %B %d, %Y')
-                
-                response = f"Here are your **AVAILABLE** time slots for **{formatted_date}**:\n\n"
-                
-                morning_slots = []
-                afternoon_slots = []
-                evening_slots = []
-                
-                for slot in available_slots:
-                    hour = int(slot['start_24'].split(':')[0])
-                    if hour < 12:
-                        morning_slots.append(slot)
-                    elif 12 <= hour < 17:
-                        afternoon_slots.append(slot)
-                    else:
-                        evening_slots.append(slot)
-                
-                if morning_slots:
-                    response += f"### 🌅 **Morning** ({len(morning_slots)} slots available)\n"
-                    for slot in morning_slots:
-                        response += f"**⏰ {slot['start']} → {slot['end']}**\n\n"
-                
-                if afternoon_slots:
-                    response += f"### ☀️ **Afternoon** ({len(afternoon_slots)} slots available)\n"
-                    for slot in afternoon_slots:
-                        response += f"**⏰ {slot['start']} → {slot['end']}**\n\n"
-                
-                if evening_slots:
-                    response += f"### 🌆 **Evening** ({len(evening_slots)} slots available)\n"
-                    for slot in evening_slots:
-                        response += f"**⏰ {slot['start']} → {slot['end']}**\n\n"
-                
-                response += f"### 📊 **Summary**\n"
-                response += f"**Total Available Slots: {len(available_slots)}**\n\n"
-                response += f"*Please book flawlessly!*"
-                
-            elif (state['intent'] in ['check_availability', 'book_appointment']) and not state.get('available_slots', []):
-                date_obj = datetime.strptime(state['date'], '%Y-%m-%d')
-                formatted_date = date_obj.strftime('%A, %B %d, %Y')
-                
-                response = f"Sorry, no free time slots available for **{formatted_date}**. You seem to be fully booked!\n\nTry checking another date or let me know if you'd like to see tomorrow's availability."
-                
-            elif state['intent'] == 'book_appointment':
-                response = "I'd be happy to help you schedule a meeting! Could you please specify:\n• What date? (today, tomorrow, or specific date)\n• What time? (e.g., 2 PM, 14:00)\n• How long? (30 minutes, 1 hour, etc.)"
-                
-            else:
-                response = "I'm your AI calendar assistant! I can help you:\n• Check availability (conflict-free slots only)\n• Schedule meetings\n• Book appointments\n\nWhat would you like to do?"
-            
-            state['response'] = response
-            
-            if 'messages' not in state:
-                state['messages'] = []
-            state['messages'].append(AIMessage(content=response))
-            
-            print("Response generated successfully")
+            payload = build_payload(state)
+            state['response_payload'] = payload
+            state['response'] = self._render(payload, state, state.get('available_slots') or [])
+            self._append_message(state, AIMessage(content=state['response'], additional_kwargs={'payload': payload}))
             
             return state
             
         except Exception as e:
             state['error'] = f"Error generating response: {str(e)}"
-            print(f"Response generation error: {state['error']}")
+            logger.exception("Response generation failed")
             return state
     
     def _handle_error_node(self, state: SchedulingState) -> SchedulingState:
         """Handle errors"""
-        error_response = f"Sorry, I encountered an error: {state['error']}"
+        payload = error_payload(state['error'])
+        error_response = self._render(payload, state)
+        state['response_payload'] = payload
         state['response'] = error_response
+        self._append_message(state, AIMessage(content=error_response, additional_kwargs={'payload': payload}))
         
-        if 'messages' not in state:
-            state['messages'] = []
-        state['messages'].append(AIMessage(content=error_response))
-        
-        print(f"Error handled: {error_response}")
+        logger.debug("Error handled: %s", state['error'])
         
         return state
     
+    @staticmethod
+    def _render(payload: Dict, state: SchedulingState, slots: List[Dict] = ()) -> str:
+        """Markdown for ``payload``, or '' when the client asked for structured responses"""
+        if state.get('response_format') == 'structured':
+            return ''
+        return render_markdown(payload, slots)
+    
     def _route_after_intent(self, state: SchedulingState) -> str:
         """Route after intent extraction"""
         if state.get('error'):
             return "error"
         elif state['intent'] == 'check_availability':
             return "check_availability"
+        elif state['intent'] == 'find_common_time':
+            return "find_common_time"
         elif state['intent'] == 'book_appointment':
-            message = state['user_input'].lower()
-            
-            if 'quickbook' in message or 'quick book' in message:
+            if state.get('quickbook'):
                 return "check_availability"
             elif state.get('time') and state.get('date'):
                 return "book_directly"
@@ -383,148 +356,185 @@ class LangGraphSchedulingAgent:
         if state.get('error'):
             return "error"
         else:
-            message = state['user_input'].lower()
-            
-            if 'quickbook' in message or 'quick book' in message:
+            if state.get('quickbook'):
                 return "show_slots"
             elif state['intent'] == 'book_appointment' and state.get('time'):
                 return "book_now"
             else:
                 return "show_slots"
     
-    def _weekday_to_number(self, weekday_name: str) -> int:
-        """Convert weekday name to number (0=Monday, 6=Sunday)"""
-        weekday_map = {
-            'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
-            'friday': 4, 'saturday': 5, 'sunday': 6
-        }
-        return weekday_map.get(weekday_name.lower(), 0)
+    def _route_after_common_time(self, state: SchedulingState) -> str:
+        """Route after ranking common time"""
+        return "error" if state.get('error') else "show_slots"
+    
+    def _route_after_booking(self, state: SchedulingState) -> str:
+        """Route after booking; a taken or rolled-back slot must be reported, not shown as no slots"""
+        return "error" if state.get('error') else "confirm"
+    
+    def _append_message(self, state: SchedulingState, message: BaseMessage) -> None:
+        """Add to the session history, keeping only the last CONVERSATION_MAX_MESSAGES"""
+        messages = list(state.get('messages') or []) + [message]
+        state['messages'] = messages[-self.max_messages:] if self.max_messages > 0 else messages
+    
+    @staticmethod
+    def _slots_version(date: str, duration: int, slots: List[Dict]) -> str:
+        """ETag for a slot list; changes whenever the offered slots do"""
+        content = f"{date}|{duration}|{','.join(slot['start_24'] for slot in slots)}"
+        return hashlib.sha1(content.encode()).hexdigest()[:16]
+    
+    def _snapshot_slot(self, snapshot: Optional[Dict], datetime_str: str, duration_minutes: int) -> Optional[Dict]:
+        """The snapshot slot starting at ``datetime_str``, if the snapshot is fresh and covers the duration"""
+        if (not snapshot or not snapshot.get('version') or time.time() - snapshot['fetched_at'] > self.slot_snapshot_ttl
+                or duration_minutes > snapshot['duration'] or datetime_str[:10] != snapshot['date']):
+            return None
+        start_24 = datetime_str[11:16]
+        return next((slot for slot in snapshot['slots'] if slot['start_24'] == start_24), None)
+    
+    @staticmethod
+    def _spent_snapshot(snapshot: Optional[Dict]) -> Dict:
+        """The snapshot without its slots once a booking changed the day; keeps the day under discussion"""
+        return {key: snapshot[key] for key in ('date', 'duration', 'fetched_at') if key in snapshot} if snapshot else {}
+    
+    def book_slot(self, session_id: str, slots_version: Optional[str], datetime_str: str,
+                  duration_minutes: int, **booking) -> Dict[str, Any]:
+        """Book a slot picked from the session's last slot list.
+        
+        When ``slots_version`` matches the session snapshot and the slot is in
+        it, the booking only rechecks the slot itself instead of the whole
+        day. Any booking outcome that changes the day drops the snapshot's
+        slots but keeps its date, so dateless follow-ups still mean that day.
+        """
+        config = {"configurable": {"thread_id": session_id}}
+        with self._session_lock(session_id):
+            snapshot = self.workflow.get_state(config).values.get('slot_snapshot') or {}
+            known_free = (
+                slots_version is not None
+                and snapshot.get('version') == slots_version
+                and self._snapshot_slot(snapshot, datetime_str, duration_minutes) is not None
+            )
+            logger.debug("Booking from slot snapshot %s: %s", slots_version, 'hit' if known_free else 'miss')
+            
+            result = self.calendar_service.book_if_free(
+                datetime_str=datetime_str,
+                duration_minutes=duration_minutes,
+                known_free=known_free,
+                **booking
+            )
+            
+            if snapshot and (result.get('success') or result.get('conflict')):
+                self.workflow.update_state(config, {'slot_snapshot': self._spent_snapshot(snapshot)}, as_node="generate_response")
+                self._maybe_compact_session(config)
+        return result
+    
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._sessions_lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                # [lock, last seen, writes since the last compaction]
+                session = self._sessions[session_id] = [threading.Lock(), 0.0, 0]
+            session[1] = time.monotonic()
+            return session[0]
+    
+    def _delete_session_state(self, session_id: str) -> bool:
+        # delete_thread only exists in newer langgraph checkpoint releases
+        delete_thread = getattr(self.checkpointer, 'delete_thread', None)
+        if delete_thread is None:
+            return False
+        delete_thread(session_id)
+        return True
+    
+    def _maybe_compact_session(self, config: Dict) -> None:
+        """Compact a session every CONVERSATION_COMPACT_EVERY_TURNS writes; call under its lock"""
+        session_id = config['configurable']['thread_id']
+        with self._sessions_lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session[2] += 1
+            if self.compact_every_turns <= 0 or session[2] < self.compact_every_turns:
+                return
+            session[2] = 0
+        self._compact_session(config)
+    
+    def _compact_session(self, config: Dict) -> None:
+        """Keep only the latest checkpoint of a session instead of one per graph step"""
+        session_id = config['configurable']['thread_id']
+        # prune is atomic in the saver but only newer checkpoint releases have it,
+        # and not every saver implements it
+        prune = getattr(self.checkpointer, 'prune', None)
+        if prune is not None:
+            try:
+                prune([session_id], strategy="keep_latest")
+                return
+            except NotImplementedError:
+                pass
+        # Savers without prune (e.g. the in-memory one): rewrite the thread as one
+        # checkpoint. Not atomic, but the caller holds the session lock
+        values = self.workflow.get_state(config).values
+        if self._delete_session_state(session_id):
+            self.workflow.update_state(config, values, as_node="generate_response")
+    
+    def _evict_idle_sessions(self) -> None:
+        """Drop conversation state for sessions idle longer than CONVERSATION_IDLE_TIMEOUT_SECONDS"""
+        now = time.monotonic()
+        if self.session_idle_seconds <= 0 or now - self._last_eviction < min(self.session_idle_seconds, 60):
+            return
+        self._last_eviction = now
+        
+        with self._sessions_lock:
+            idle = [
+                session_id for session_id, (lock, last_seen, _) in self._sessions.items()
+                if now - last_seen > self.session_idle_seconds and not lock.locked()
+            ]
+            for session_id in idle:
+                del self._sessions[session_id]
+        
+        for session_id in idle:
+            self._delete_session_state(session_id)
+        if idle:
+            logger.info("Evicted %d idle conversation sessions", len(idle))
     
     def _extract_date(self, message: str) -> str:
         """Extract date from message"""
-        try:
-            print(f"Extracting date from: {message}")
-            
-            if re.search(r'\btoday\b', message):
-                result = datetime.now().date().isoformat()
-                print(f"Found 'today': {result}")
-                return result
-            
-            if re.search(r'\btomorrow\b', message):
-                result = (datetime.now() + timedelta(days=1)).date().isoformat()
-                print(f"Found 'tomorrow': {result}")
-                return result
-            
-            this_weekday_match = re.search(r'\bthis\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b', message, re.IGNORECASE)
-            if this_weekday_match:
-                weekday_name = this_weekday_match.group(1).lower()
-                weekday_num = self._weekday_to_number(weekday_name)
-                result = self._get_next_weekday(weekday_num)
-                print(f"Found 'this {weekday_name}': {result}")
-                return result
-            
-            weekday_match = re.search(r'\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b', message, re.IGNORECASE)
-            if weekday_match:
-                weekday_name = weekday_match.group(1).lower()
-                weekday_num = self._weekday_to_number(weekday_name)
-                result = self._get_next_weekday(weekday_num)
-                print(f"Found weekday '{weekday_name}': {result}")
-                return result
-            
-            if re.search(r'\bnext week\b', message):
-                result = (datetime.now() + timedelta(days=7)).date().isoformat()
-                print(f"Found 'next week': {result}")
-                return result
-            
-            iso_date_match = re.search(r'\b(\d{4}-\d{2}-\d{2})\b', message)
-            if iso_date_match:
-                result = iso_date_match.group(1)
-                print(f"Found ISO date: {result}")
-                return result
-            
-            us_date_match = re.search(r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b', message)
-            if us_date_match:
-                month, day, year = us_date_match.groups()
-                result = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                print(f"Found US date: {result}")
-                return result
-            
-            result = datetime.now().date().isoformat()
-            print(f"No specific date found, defaulting to today: {result}")
-            return result
-            
-        except Exception as e:
-            print(f"Date extraction error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return datetime.now().date().isoformat()
+        return parse_message(message).date
     
     def _extract_time(self, message: str) -> Optional[str]:
         """Extract time from message"""
-        time_patterns = [
-            r'\b(\d{1,2}):(\d{2})\s*(am|pm)\b',
-            r'\b(\d{1,2})\s*(am|pm)\b',
-            r'\b(\d{1,2}):(\d{2})\b'
-        ]
-        
-        for pattern in time_patterns:
-            match = re.search(pattern, message)
-            if match:
-                if len(match.groups()) == 3:
-                    hour, minute, period = match.groups()
-                    hour = int(hour)
-                    if period.lower() == 'pm' and hour != 12:
-                        hour += 12
-                    elif period.lower() == 'am' and hour == 12:
-                        hour = 0
-                    return f"{hour:02d}:{minute}"
-                elif len(match.groups()) == 2:
-                    hour, period = match.groups()
-                    hour = int(hour)
-                    if period.lower() == 'pm' and hour != 12:
-                        hour += 12
-                    elif period.lower() == 'am' and hour == 12:
-                        hour = 0
-                    return f"{hour:02d}:00"
-                else:
-                    hour, minute = match.groups()
-                    return f"{int(hour):02d}:{minute}"
-        
-        return None
+        return parse_message(message).time
     
     def _extract_duration(self, message: str) -> int:
         """Extract duration from message"""
-        duration_match = re.search(r'\b(\d+)\s*(hour|hr|minute|min)', message)
-        if duration_match:
-            duration_value = int(duration_match.group(1))
-            duration_unit = duration_match.group(2)
-            if 'hour' in duration_unit or 'hr' in duration_unit:
-                return duration_value * 60
-            else:
-                return duration_value
-        return 60
+        return parse_message(message).duration
     
-    def _get_next_weekday(self, weekday: int) -> str:
-        """Get the next occurrence of a weekday (0=Monday, 6=Sunday)"""
-        try:
-            today = datetime.now().date()
-            days_ahead = weekday - today.weekday()
-            if days_ahead <= 0:
-                days_ahead += 7
-            target_date = today + timedelta(days=days_ahead)
-            print(f"Weekday calculation - Today: {today} (weekday {today.weekday()}), Target weekday: {weekday}, Days ahead: {days_ahead}, Result: {target_date}")
-            return target_date.isoformat()
-        except Exception as e:
-            print(f"Weekday calculation error: {str(e)}")
-            return datetime.now().date().isoformat()
-    
-    def process_message(self, message: str, session_id: str = "default") -> Dict[str, Any]:
+    def process_message(self, message: str, session_id: str = "default",
+                        response_format: str = "markdown") -> Dict[str, Any]:
         """Process a message through the LangGraph workflow"""
+        result = {}
+        
+        def keep_done(event: str, data: Dict[str, Any]) -> None:
+            nonlocal result
+            if event == 'done':
+                result = data
+        
+        self.stream_message(message, session_id, keep_done, response_format)
+        return result
+    
+    def stream_message(self, message: str, session_id: str, emit: Callable[[str, Dict[str, Any]], None],
+                       response_format: str = "markdown") -> None:
+        """Run the workflow for one message, passing (event, data) to ``emit`` as each node finishes.
+        
+        Events: intent, availability, slots (chunks of STREAM_SLOT_CHUNK_SIZE),
+        booking, response, error, and finally done with the same payload
+        process_message returns. The session lock is held for the whole turn,
+        so ``emit`` should only hand events off (e.g. to a queue) rather than
+        wait on a slow consumer.
+        """
+        session_id_var.set(session_id)
         try:
-            print(f"\nStarting LangGraph workflow for: {message}")
+            logger.debug("Starting LangGraph workflow for: %s", message)
             
-            initial_state: SchedulingState = {
-                "messages": [],
+            # Per-turn fields; messages and slot_snapshot carry over through the checkpointer
+            turn_state = {
                 "user_input": message,
                 "intent": "",
                 "date": None,
@@ -535,35 +545,88 @@ class LangGraphSchedulingAgent:
                 "booking_confirmed": False,
                 "booking_details": {},
                 "response": "",
+                "response_payload": {},
+                "response_format": response_format,
                 "error": None,
                 "session_id": session_id,
-                "next_action": ""
+                "next_action": "",
+                "quickbook": False,
+                "attendees": [],
+                "common_time": {}
             }
-            
-            final_state = self.workflow.invoke(initial_state)
-            
-            print("LangGraph workflow completed successfully")
-            print(f"Returning {len(final_state['available_slots'])} available slots")
-            
-            return {
+            config = {"configurable": {"thread_id": session_id}}
+            final_state = dict(turn_state)
+            
+            with self._session_lock(session_id):
+                for update in self.workflow.stream(turn_state, config=config, stream_mode="updates"):
+                    for node, node_state in update.items():
+                        final_state.update(node_state or {})
+                        for event in self._node_events(node, final_state):
+                            emit(*event)
+                self._maybe_compact_session(config)
+            self._evict_idle_sessions()
+            
+            logger.debug("LangGraph workflow completed with %d available slots", len(final_state['available_slots']))
+            
+            snapshot = final_state.get("slot_snapshot") or {}
+            emit('done', {
                 "response": final_state["response"],
+                "payload": final_state["response_payload"],
                 "intent": final_state["intent"],
                 "available_slots": final_state["available_slots"],
+                # Common-time slots aren't from the snapshot, so they carry no version
+                "slots_version": snapshot.get("version") if final_state["available_slots"] and final_state["intent"] != "find_common_time" else None,
                 "booking_info": {
                     "booked": final_state["booking_confirmed"],
                     **final_state["booking_details"]
                 } if final_state["booking_confirmed"] else {}
-            }
+            })
             
         except Exception as e:
-            print(f"LangGraph workflow error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return {
-                "response": f"Sorry, I encountered an error: {str(e)}",
+            logger.exception("LangGraph workflow failed")
+            emit('error', {"message": str(e)})
+            emit('done', {
+                "response": "" if response_format == "structured" else f"Sorry, I encountered an error: {str(e)}",
+                "payload": error_payload(str(e)),
                 "intent": "error",
                 "available_slots": [],
                 "booking_info": {}
+            })
+    
+    def _node_events(self, node: str, state: SchedulingState) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Progress events for the node that just finished"""
+        if node == "extract_intent":
+            yield 'intent', {
+                "intent": state["intent"],
+                "date": state["date"],
+                "time": state["time"],
+                "duration": state["duration"]
             }
-
-SchedulingWorkflow = LangGraphSchedulingAgent()
\ No newline at end of file
+        elif node == "check_availability":
+            slots = state.get("available_slots") or []
+            yield 'availability', {
+                "date": state["date"],
+                "count": len(slots),
+                "slots_version": (state.get("slot_snapshot") or {}).get("version")
+            }
+            for i in range(0, len(slots), self.stream_chunk_size):
+                yield 'slots', {"slots": slots[i:i + self.stream_chunk_size]}
+        elif node == "find_common_time":
+            common = state.get("common_time") or {}
+            slots = state.get("available_slots") or []
+            yield 'availability', {
+                "date": state["date"],
+                "count": len(slots),
+                "attendees": common.get("attendees", []),
+                "unknown_attendees": common.get("unknown_attendees", [])
+            }
+            for i in range(0, len(slots), self.stream_chunk_size):
+                yield 'slots', {"slots": slots[i:i + self.stream_chunk_size]}
+        elif node == "book_appointment":
+            yield 'booking', {
+                "booked": state["booking_confirmed"],
+                "error": state.get("error"),
+                **state["booking_details"]
+            }
+        elif node in ("generate_response", "handle_error"):
+            yield 'response', {"response": state["response"], "payload": state["response_payload"]}
@@ -0,0 +1,111 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+# Correlation IDs: set per HTTP request / conversation, read by every log record.
+# Worker-pool code sees them because main.run_blocking copies the context.
+request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+session_id_var: ContextVar[Optional[str]] = ContextVar('session_id', default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+class CorrelationFilter(logging.Filter):
+    """Stamp records with the caller's request and session IDs.
+
+    Runs on the QueueHandler, in the thread that logged, before the record
+    crosses to the listener thread where the context vars would be unset.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log pipelines"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for field in ('request_id', 'session_id'):
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the correlation IDs when present"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s%(correlation)s %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        ids = [f"{label}={value}" for label, value in (('req', getattr(record, 'request_id', None)),
+                                                       ('session', getattr(record, 'session_id', None))) if value]
+        record.correlation = f" [{' '.join(ids)}]" if ids else ''
+        return super().format(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() folds the traceback into the message; keep it in
+        # exc_text instead so the JSON formatter can give it its own field
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = None, fmt: str = None) -> None:
+    """Route the root logger through a queue drained by a background thread.
+
+    Callers only enqueue records (after the level check, so a disabled
+    debug call costs one comparison); formatting and the blocking stdout
+    write happen on the listener thread. LOG_LEVEL sets the level and
+    LOG_FORMAT=json switches to one JSON object per line. Safe to call
+    more than once.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+        fmt = (fmt or os.getenv('LOG_FORMAT', 'text')).lower()
+
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+        records = queue.SimpleQueue()
+        handler = _QueueHandler(records)
+        handler.addFilter(CorrelationFilter())
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
@@ -0,0 +1,216 @@
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+import pytz
+
+from .metrics import track_lru_cache
+
+INTENT_KEYWORDS = {
+    'book_appointment': ('book', 'schedule', 'meeting', 'appointment', 'call', 'quickbook'),
+    'check_availability': ('available', 'free', 'availability', 'check', 'when', 'find'),
+    'cancel_appointment': ('cancel', 'delete', 'remove'),
+}
+# When a message matches several intents, the first one listed wins
+INTENT_PRIORITY = ('book_appointment', 'check_availability', 'cancel_appointment')
+
+WEEKDAYS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3,
+    'friday': 4, 'saturday': 5, 'sunday': 6
+}
+
+DEFAULT_DURATION = 60
+
+LOCAL_TIMEZONE = pytz.timezone(os.getenv('TIMEZONE', 'Asia/Kolkata'))
+PARSER_CACHE_SIZE = int(os.getenv('PARSER_CACHE_SIZE', 1024))
+
+_KEYWORD_INTENTS = {
+    keyword: intent for intent, keywords in INTENT_KEYWORDS.items() for keyword in keywords
+}
+
+
+def _alternation(words) -> str:
+    # Longest first so "availability" is tried before "available"
+    return '|'.join(sorted(map(re.escape, words), key=len, reverse=True))
+
+
+# One compiled alternation for everything the parser cares about. Each message
+# is scanned once with finditer; words that aren't keywords are skipped inside
+# the regex engine and matches are dispatched on the outer group name.
+# Keywords match as word prefixes ("booking" counts as "book"); emails come
+# first so an address is never split into keywords or numbers.
+_TOKEN_RE = re.compile(rf"""
+      (?P<email>\b[a-z0-9._%+-]+@[a-z0-9-]+(?:\.[a-z0-9-]+)*\.[a-z]{{2,}}\b)
+    | (?P<iso>\b\d{{4}}-\d{{2}}-\d{{2}}\b)
+    | (?P<us>\b(?P<us_month>\d{{1,2}})/(?P<us_day>\d{{1,2}})/(?P<us_year>\d{{4}})\b)
+    | (?P<clock>\b(?P<clock_hour>\d{{1,2}}):(?P<clock_minute>\d{{2}})(?:\s*(?P<clock_period>am|pm)\b|\b))
+    | (?P<number>\b(?P<number_value>\d+)(?:\s*(?P<number_period>am|pm)\b|\s*[-–]?\s*(?P<unit>hour|hr|minute|min))?)
+    | (?P<day>\b(?:today|tomorrow|{_alternation(WEEKDAYS)})\b)
+    | (?P<next_week>\bnext\s+week\b)
+    | (?P<quick_book>\bquick\s+book)
+    | (?P<keyword>\b(?:{_alternation(_KEYWORD_INTENTS)}))[a-z]*
+""", re.VERBOSE)
+
+_PERIOD_RE = re.compile(r'\b([ap])\.m\.')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def _to_24_hour(hour: int, period: Optional[str]) -> int:
+    if period == 'pm' and hour != 12:
+        return hour + 12
+    if period == 'am' and hour == 12:
+        return 0
+    return hour
+
+
+@dataclass(frozen=True)
+class ParsedMessage:
+    """Everything the scheduling agent extracts from one user message"""
+    intent: str
+    date: str
+    time: Optional[str]
+    duration: int
+    quickbook: bool
+    # Relative phrase ("tomorrow", "friday") or literal date the date came from; None when defaulted
+    date_phrase: Optional[str] = None
+    has_duration: bool = False
+    # Email addresses named in the message, in order of appearance
+    attendees: Tuple[str, ...] = ()
+
+
+def _next_weekday(today: date, weekday: int) -> date:
+    days_ahead = weekday - today.weekday()
+    if days_ahead <= 0:
+        days_ahead += 7
+    return today + timedelta(days=days_ahead)
+
+
+def current_date() -> date:
+    """Today in the configured TIMEZONE"""
+    return datetime.now(LOCAL_TIMEZONE).date()
+
+
+@lru_cache(maxsize=8)
+def relative_dates(today: date) -> Mapping[str, date]:
+    """Phrase -> date table for ``today``.
+
+    Keyed by the date, so a long-running process builds a fresh table after
+    midnight instead of resolving "tomorrow" against the day it started.
+    """
+    table = {
+        'today': today,
+        'tomorrow': today + timedelta(days=1),
+        'next week': today + timedelta(days=7),
+    }
+    for name, weekday in WEEKDAYS.items():
+        table[name] = _next_weekday(today, weekday)
+    return MappingProxyType(table)
+
+
+def normalize_message(message: str) -> str:
+    """Lower-case, fold "p.m." to "pm" and collapse whitespace"""
+    return _SPACE_RE.sub(' ', _PERIOD_RE.sub(r'\1m', message.lower())).strip()
+
+
+def parse_message(message: str, today: Optional[date] = None) -> ParsedMessage:
+    """Parse a message, memoised on (normalized text, date).
+
+    Quick-action phrases like "check availability tomorrow" are parsed once
+    per day; the date in the key keeps relative phrases from going stale.
+    """
+    return _parse_normalized(normalize_message(message), today or current_date())
+
+
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
+def _parse_normalized(text: str, today: date) -> ParsedMessage:
+    """Extract intent, date, time and duration in a single pass over the text.
+
+    Precedence follows the agent's original rules: dates prefer
+    today > tomorrow > weekday > "next week" > ISO > US format (default
+    today); times prefer "h:mm am/pm" > "h am/pm" > "hh:mm". Naming
+    attendees by email turns an availability request, or a booking without
+    a time, into find_common_time; a booking at a given time stays a
+    booking and invites them.
+    """
+    relative = relative_dates(today)
+
+    intents = set()
+    dates = {}
+    clock_with_period = hour_with_period = clock = None
+    duration = None
+    quickbook = False
+    attendees = []
+
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'email':
+            email = match.group('email')
+            if email not in attendees:
+                attendees.append(email)
+        elif kind == 'keyword':
+            keyword = match.group('keyword')
+            intents.add(_KEYWORD_INTENTS[keyword])
+            if keyword == 'quickbook':
+                quickbook = True
+        elif kind == 'day':
+            day = match.group('day')
+            dates.setdefault(day if day in ('today', 'tomorrow') else 'weekday', (day, relative[day]))
+        elif kind == 'next_week':
+            dates.setdefault('next_week', ('next week', relative['next week']))
+        elif kind == 'quick_book':
+            intents.add('book_appointment')
+            quickbook = True
+        elif kind == 'iso':
+            iso = match.group('iso')
+            dates.setdefault('iso', (iso, iso))
+        elif kind == 'us':
+            month, day, year = match.group('us_month', 'us_day', 'us_year')
+            dates.setdefault('us', (match.group('us'), f"{year}-{month.zfill(2)}-{day.zfill(2)}"))
+        elif kind == 'clock':
+            hour, minute, period = match.group('clock_hour', 'clock_minute', 'clock_period')
+            hour = int(hour)
+            if int(minute) > 59:
+                continue
+            if period:
+                if clock_with_period is None and 1 <= hour <= 12:
+                    clock_with_period = f"{_to_24_hour(hour, period):02d}:{minute}"
+            elif clock is None and hour <= 23:
+                clock = f"{hour:02d}:{minute}"
+        elif kind == 'number':
+            number, period, unit = match.group('number_value', 'number_period', 'unit')
+            if period:
+                if hour_with_period is None and len(number) <= 2 and 1 <= int(number) <= 12:
+                    hour_with_period = f"{_to_24_hour(int(number), period):02d}:00"
+            elif unit and duration is None:
+                duration = int(number) * 60 if unit.startswith('h') else int(number)
+
+    intent = next((name for name in INTENT_PRIORITY if name in intents), 'general_chat')
+    time = clock_with_period or hour_with_period or clock
+    if attendees and (intent == 'check_availability' or (intent == 'book_appointment' and time is None)):
+        intent = 'find_common_time'
+
+    date_phrase, resolved_date = next(
+        (dates[kind] for kind in ('today', 'tomorrow', 'weekday', 'next_week', 'iso', 'us') if kind in dates),
+        (None, today)
+    )
+    if isinstance(resolved_date, date):
+        resolved_date = resolved_date.isoformat()
+
+    return ParsedMessage(
+        intent=intent,
+        date=resolved_date,
+        time=time,
+        duration=duration or DEFAULT_DURATION,
+        quickbook=quickbook,
+        date_phrase=date_phrase,
+        has_duration=duration is not None,
+        attendees=tuple(attendees),
+    )
+
+
+track_lru_cache('message_parser', _parse_normalized)
+track_lru_cache('relative_dates', relative_dates)
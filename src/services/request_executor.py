@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import random
+import socket
+import ssl
+import threading
+import time
+from typing import Optional
+
+import httplib2
+from google.auth.exceptions import RefreshError, TransportError
+from googleapiclient.errors import HttpError
+
+from .metrics import CALENDAR_API_DURATION, CALENDAR_API_FAILURES, CALENDAR_API_RETRIES, CALENDAR_RATE_LIMIT_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Rate-limit reasons Google reports with a 403 instead of a 429
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded')
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+
+
+def http_timeout_seconds() -> float:
+    """GOOGLE_HTTP_TIMEOUT_SECONDS, the HTTP client's per-attempt timeout; shared with google_client"""
+    return float(os.getenv('GOOGLE_HTTP_TIMEOUT_SECONDS', 10))
+
+
+class CalendarUnavailableError(Exception):
+    """Google Calendar stayed throttled or failing past the retry budget or deadline"""
+
+
+class TokenBucket:
+    """Client-side rate limiter: ``rate`` tokens per second, bursts up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1, deadline: Optional[float] = None) -> bool:
+        """Take ``tokens``, waiting for them; False if they can't be had before ``deadline``.
+
+        A cost above ``capacity`` (a large batch) waits for a full bucket and
+        is then charged in full, leaving the bucket in debt so later callers
+        wait for the excess to refill.
+        """
+        needed = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return True
+                wait = (needed - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def drain(self) -> None:
+        """Empty the bucket so every caller slows down after Google pushes back"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0)
+
+
+def _error_reason(error: HttpError) -> str:
+    try:
+        return json.loads(error.content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return ''
+
+
+class RequestExecutor:
+    """Runs Calendar API requests with rate limiting, retries and a deadline.
+
+    Every request first takes a token from a bucket refilled at CALENDAR_QPS
+    (bursts of CALENDAR_BURST), so a traffic spike queues here instead of
+    tripping Google's quota. Rate-limit responses (429, or 403 with a
+    rate-limit reason) are retried with full-jitter exponential backoff and
+    drain the bucket; 5xx and network errors are retried too, but only for
+    idempotent requests, since a failed insert may still have been created.
+    A failed token refresh is retried only if it never reached Google; a
+    refresh Google rejected fails at once. An attempt only starts if it can
+    run for the full GOOGLE_HTTP_TIMEOUT_SECONDS before the call's deadline,
+    so retries stop at CALENDAR_MAX_RETRIES or when no attempt fits,
+    raising CalendarUnavailableError.
+    """
+
+    def __init__(self, qps: float = None, burst: float = None, max_retries: int = None,
+                 base_delay: float = None, max_delay: float = None, deadline_seconds: float = None,
+                 attempt_timeout: float = None):
+        qps = float(os.getenv('CALENDAR_QPS', 10)) if qps is None else qps
+        burst = float(os.getenv('CALENDAR_BURST', 20)) if burst is None else burst
+        self.bucket = TokenBucket(qps, burst)
+        self.max_retries = int(os.getenv('CALENDAR_MAX_RETRIES', 5)) if max_retries is None else max_retries
+        self.base_delay = float(os.getenv('CALENDAR_RETRY_BASE_SECONDS', 0.5)) if base_delay is None else base_delay
+        self.max_delay = float(os.getenv('CALENDAR_RETRY_MAX_SECONDS', 8)) if max_delay is None else max_delay
+        self.deadline_seconds = (float(os.getenv('CALENDAR_REQUEST_DEADLINE_SECONDS', 20))
+                                 if deadline_seconds is None else deadline_seconds)
+        # The HTTP client's timeout, i.e. how long one attempt can take
+        self.attempt_timeout = http_timeout_seconds() if attempt_timeout is None else attempt_timeout
+        if self.attempt_timeout > self.deadline_seconds:
+            raise ValueError(
+                f"GOOGLE_HTTP_TIMEOUT_SECONDS ({self.attempt_timeout:g}) exceeds "
+                f"CALENDAR_REQUEST_DEADLINE_SECONDS ({self.deadline_seconds:g}); one attempt could outlive the deadline"
+            )
+
+    def execute(self, request, idempotent: bool = True, cost: int = 1, deadline_seconds: float = None):
+        """``request.execute()`` under the rate limit, retrying retryable failures.
+
+        ``cost`` is the number of API calls the request spends from the quota
+        (the item count for a batch).
+        """
+        deadline = time.monotonic() + (self.deadline_seconds if deadline_seconds is None else deadline_seconds)
+        # Latest time an attempt can start and still time out before the deadline
+        start_by = deadline - self.attempt_timeout
+        # e.g. calendar.events.list; batches have no single method
+        method = getattr(request, 'methodId', None) or 'batch'
+        attempt = 0
+        while True:
+            waited_from = time.perf_counter()
+            acquired = time.monotonic() <= start_by and self.bucket.acquire(cost, start_by)
+            CALENDAR_RATE_LIMIT_WAIT.observe(time.perf_counter() - waited_from)
+            if not acquired:
+                CALENDAR_API_FAILURES.inc(method=method)
+                raise CalendarUnavailableError("Google Calendar request rate limit reached, please retry shortly")
+            started = time.perf_counter()
+            try:
+                result = request.execute()
+            except Exception as e:
+                CALENDAR_API_DURATION.observe(time.perf_counter() - started, method=method, outcome=self._outcome(e))
+                if isinstance(e, RefreshError):
+                    # Revoked or expired grant: no retry will fix it
+                    CALENDAR_API_FAILURES.inc(method=method)
+                    raise CalendarUnavailableError(f"Google Calendar credentials could not be refreshed: {e}") from e
+                rate_limited, retryable = self._classify(e, idempotent)
+                if not retryable:
+                    raise
+                if rate_limited:
+                    self.bucket.drain()
+                attempt += 1
+                delay = max(self._backoff(attempt), self._retry_after(e))
+                if attempt > self.max_retries or time.monotonic() + delay > start_by:
+                    CALENDAR_API_FAILURES.inc(method=method)
+                    raise CalendarUnavailableError(
+                        f"Google Calendar is unavailable after {attempt} attempts: {e}"
+                    ) from e
+                CALENDAR_API_RETRIES.inc(method=method, reason='rate_limited' if rate_limited else self._outcome(e))
+                logger.warning("Calendar request failed (%s), retry %d/%d in %.2fs",
+                               e.__class__.__name__, attempt, self.max_retries, delay)
+                time.sleep(delay)
+            else:
+                CALENDAR_API_DURATION.observe(time.perf_counter() - started, method=method, outcome='ok')
+                return result
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential delay before retry ``attempt`` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+    
+    def execute_batch(self, new_batch, requests: dict, callback, deadline_seconds: float = None) -> None:
+        """Send ``requests`` ({request_id: request}) as a batch, resending throttled items.
+
+        Google rate-limits batch items one by one, so a batch that succeeds can
+        still carry 429s or rate-limit 403s for some items. Those are collected
+        and sent again in a fresh batch from ``new_batch(callback=...)`` after
+        the same backoff as execute; every other item result goes to
+        ``callback(request_id, response, exception)``. Items still throttled
+        after CALENDAR_MAX_RETRIES, or when no attempt fits the deadline, are
+        reported with CalendarUnavailableError.
+        """
+        deadline = time.monotonic() + (self.deadline_seconds if deadline_seconds is None else deadline_seconds)
+        pending = dict(requests)
+        attempt = 0
+        while pending:
+            throttled = {}
+            
+            def collect(request_id, response, exception):
+                if exception is not None and self._classify(exception, False)[0]:
+                    throttled[request_id] = exception
+                else:
+                    callback(request_id, response, exception)
+            
+            batch = new_batch(callback=collect)
+            for request_id, request in pending.items():
+                batch.add(request, request_id=request_id)
+            self.execute(batch, idempotent=False, cost=len(pending), deadline_seconds=deadline - time.monotonic())
+            if not throttled:
+                return
+            
+            self.bucket.drain()
+            attempt += 1
+            delay = max(self._backoff(attempt), *(self._retry_after(e) for e in throttled.values()))
+            if attempt > self.max_retries or time.monotonic() + delay > deadline - self.attempt_timeout:
+                CALENDAR_API_FAILURES.inc(method='batch')
+                for request_id, e in throttled.items():
+                    callback(request_id, None, CalendarUnavailableError(
+                        f"Google Calendar is still rate limiting this request after {attempt} attempts: {e}"
+                    ))
+                return
+            CALENDAR_API_RETRIES.inc(method='batch', reason='rate_limited')
+            logger.warning("%d of %d batch items rate limited, retry %d/%d in %.2fs",
+                           len(throttled), len(pending), attempt, self.max_retries, delay)
+            time.sleep(delay)
+            pending = {request_id: pending[request_id] for request_id in throttled}
+    
+    @staticmethod
+    def _classify(error: Exception, idempotent: bool):
+        """(rate limited, retryable) for a failed attempt"""
+        if isinstance(error, HttpError):
+            status = error.resp.status
+            if status == 429 or (status == 403 and _error_reason(error) in RATE_LIMIT_REASONS):
+                # Rejected before it ran, so safe to resend even when not idempotent
+                return True, True
+            return False, idempotent and status in SERVER_ERROR_STATUSES
+        if isinstance(error, TransportError):
+            # The token refresh failed on the network, before the request itself was sent
+            return False, True
+        if isinstance(error, (socket.timeout, ConnectionError, ssl.SSLError, httplib2.HttpLib2Error)):
+            return False, idempotent
+        return False, False
+
+    @staticmethod
+    def _outcome(error: Exception) -> str:
+        """Metrics label for a failed attempt: http_<status> or the exception class"""
+        if isinstance(error, HttpError):
+            return f"http_{error.resp.status}"
+        return error.__class__.__name__
+
+    @staticmethod
+    def _retry_after(error: Exception) -> float:
+        if isinstance(error, HttpError):
+            try:
+                return float(error.resp.get('retry-after', 0))
+            except (TypeError, ValueError):
+                pass
+        return 0.0
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def get_request_executor() -> RequestExecutor:
+    """Process-wide executor; the Calendar quota is shared by every CalendarService"""
+    global _default_executor
+    if _default_executor is None:
+        with _default_executor_lock:
+            if _default_executor is None:
+                _default_executor = RequestExecutor()
+    return _default_executor
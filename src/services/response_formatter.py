@@ -0,0 +1,220 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import track_lru_cache
+
+# Template ids the frontend (or any client) can switch on instead of parsing markdown
+BOOKING_CONFIRMED = 'booking_confirmed'
+BOOKING_SLOTS = 'booking_slots'
+AVAILABILITY_SLOTS = 'availability_slots'
+NO_SLOTS = 'no_slots'
+COMMON_TIME = 'common_time'
+HELP = 'help'
+ERROR = 'error'
+
+BUCKETS = ('morning', 'afternoon', 'evening')
+
+
+def bucket_slots(slots: List[Dict], requested_time: Optional[str] = None) -> Tuple[Dict[str, List[int]], bool]:
+    """Split slots into morning (<12h), afternoon (<17h) and evening in one pass.
+
+    Buckets hold indexes into ``slots`` so the payload doesn't repeat them.
+    Also reports whether ``requested_time`` (HH:MM) is one of the slot starts.
+    """
+    buckets = {name: [] for name in BUCKETS}
+    morning, afternoon, evening = buckets['morning'], buckets['afternoon'], buckets['evening']
+    requested_available = False
+    for i, slot in enumerate(slots):
+        start_24 = slot['start_24']
+        hour = int(start_24[:start_24.index(':')])
+        if hour < 12:
+            morning.append(i)
+        elif hour < 17:
+            afternoon.append(i)
+        else:
+            evening.append(i)
+        if start_24 == requested_time:
+            requested_available = True
+    return buckets, requested_available
+
+
+def build_payload(state: Dict) -> Dict:
+    """Structured response for a finished workflow state"""
+    if state.get('booking_confirmed', False):
+        return {'template': BOOKING_CONFIRMED, 'booking': state['booking_details']}
+
+    intent = state['intent']
+    slots = state.get('available_slots') or []
+    if intent == 'find_common_time':
+        common = state.get('common_time') or {}
+        requested_time = state.get('time')
+        payload = {
+            'template': COMMON_TIME,
+            'date': state['date'],
+            'attendees': common.get('attendees', []),
+            'unknown_attendees': common.get('unknown_attendees', []),
+            'total_slots': len(slots),
+            'everyone_free': sum(1 for slot in slots if not slot['unavailable']),
+        }
+        if requested_time:
+            payload['requested_time'] = requested_time
+            payload['requested_time_available'] = any(
+                slot['start_24'] == requested_time and not slot['unavailable'] for slot in slots
+            )
+        return payload
+    if intent in ('check_availability', 'book_appointment'):
+        if not slots:
+            return {'template': NO_SLOTS, 'date': state['date']}
+        requested_time = state.get('time') if intent == 'book_appointment' else None
+        buckets, requested_available = bucket_slots(slots, requested_time)
+        payload = {
+            'template': BOOKING_SLOTS if intent == 'book_appointment' else AVAILABILITY_SLOTS,
+            'date': state['date'],
+            'slot_buckets': buckets,
+            'total_slots': len(slots),
+        }
+        if requested_time:
+            payload['requested_time'] = requested_time
+            payload['requested_time_available'] = requested_available
+        return payload
+
+    return {'template': HELP}
+
+
+def error_payload(error: str) -> Dict:
+    return {'template': ERROR, 'error': error}
+
+
+def render_markdown(payload: Dict, slots: List[Dict] = ()) -> str:
+    """Markdown text for a payload; rendering is memoised on the payload's content"""
+    template = payload['template']
+    if template == BOOKING_CONFIRMED:
+        booking = payload['booking']
+        return _render_booking(booking['date'], booking['time'], booking['duration'],
+                               booking['title'], booking.get('event_link') or '', booking.get('verification'))
+    if template in (BOOKING_SLOTS, AVAILABILITY_SLOTS):
+        buckets = tuple(
+            tuple((slots[i]['start'], slots[i]['end']) for i in payload['slot_buckets'][name])
+            for name in BUCKETS
+        )
+        return _render_slots(template, payload['date'], buckets, payload.get('requested_time'),
+                             payload.get('requested_time_available', False))
+    if template == NO_SLOTS:
+        return _render_no_slots(payload['date'])
+    if template == COMMON_TIME:
+        ranked = tuple((slot['start'], slot['end'], tuple(slot['unavailable'])) for slot in slots)
+        return _render_common_time(payload['date'], ranked, len(payload['attendees']),
+                                   tuple(payload['unknown_attendees']), payload.get('requested_time'),
+                                   payload.get('requested_time_available', False))
+    if template == ERROR:
+        return f"Sorry, I encountered an error: {payload['error']}"
+    return ("I'm your AI calendar assistant! I can help you:\n"
+            "• Check availability (conflict-free slots only)\n"
+            "• Schedule meetings\n"
+            "• Book appointments\n\n"
+            "What would you like to do?")
+
+
+def _format_date(date_str: str) -> str:
+    return datetime.strptime(date_str, '%Y-%m-%d').strftime('%A, %B %d, %Y')
+
+
+@lru_cache(maxsize=256)
+def _render_booking(date: str, time: str, duration: int, title: str, event_link: str,
+                    verification: Optional[str] = None) -> str:
+    parts = [
+        "Perfect! I've successfully booked your meeting:\n\n",
+        f"**Date:** {date}\n",
+        f"**Time:** {time}\n",
+        f"**Duration:** {duration} minutes\n",
+        f"**Title:** {title}\n",
+    ]
+    if event_link:
+        parts.append(f"\n[View in Google Calendar]({event_link})")
+    if verification == 'unverified':
+        # The post-insert conflict check itself failed, so a clash can't be ruled out
+        parts.append("\n\nThe meeting is on your calendar, but I couldn't double-check it for a "
+                     "conflicting booking made at the same moment. Please take a quick look at your calendar.")
+    else:
+        parts.append("\n\nYour appointment has been confirmed!")
+    return "".join(parts)
+
+
+@lru_cache(maxsize=256)
+def _render_no_slots(date: str) -> str:
+    return (f"Sorry, no free time slots available for **{_format_date(date)}**. You seem to be fully booked!\n\n"
+            "Try checking another date or let me know if you'd like to see tomorrow's availability.")
+
+
+@lru_cache(maxsize=256)
+def _render_slots(template: str, date: str, buckets: Tuple, requested_time: Optional[str],
+                  requested_available: bool) -> str:
+    formatted_date = _format_date(date)
+    total = sum(len(bucket) for bucket in buckets)
+    morning, afternoon, evening = buckets
+    parts = []
+
+    if template == BOOKING_SLOTS:
+        if requested_time:
+            parts.append(f"I'd be happy to schedule a meeting for **{requested_time}** on **{formatted_date}**!\n\n")
+            parts.append("Here are the available time slots for that day. Please click on your preferred slot to book:\n\n")
+        else:
+            parts.append(f"I'd be happy to help you schedule a meeting on **{formatted_date}**!\n\n")
+            parts.append("Here are the available time slots. Please click on your preferred slot to book:\n\n")
+
+        for prefix, label, bucket in (("", "Morning", morning), ("\n", "Afternoon", afternoon), ("\n", "Evening", evening)):
+            if bucket:
+                parts.append(f"{prefix}**{label} ({len(bucket)} slots):**\n")
+                parts.extend(f"• {start} - {end}\n" for start, end in bucket)
+
+        parts.append(f"\n**Total available slots: {total}**")
+        parts.append("\n\nClick any slot below to open the booking form!")
+        if requested_time:
+            if requested_available:
+                parts.append(f"\n\nGood news! Your requested time ({requested_time}) is available!")
+            else:
+                parts.append(f"\n\nSorry, your requested time ({requested_time}) is not available. Please choose from the available slots above.")
+        return "".join(parts)
+
+    parts.append(f"Here are your **AVAILABLE** time slots for **{formatted_date}**:\n\n")
+    for label, bucket in (("🌅 **Morning**", morning), ("☀️ **Afternoon**", afternoon), ("🌆 **Evening**", evening)):
+        if bucket:
+            parts.append(f"### {label} ({len(bucket)} slots available)\n")
+            parts.extend(f"**⏰ {start} → {end}**\n\n" for start, end in bucket)
+    parts.append("### 📊 **Summary**\n")
+    parts.append(f"**Total Available Slots: {total}**\n\n")
+    parts.append("*Please book flawlessly!*")
+    return "".join(parts)
+
+
+@lru_cache(maxsize=256)
+def _render_common_time(date: str, ranked: Tuple, attendee_count: int, unknown: Tuple,
+                        requested_time: Optional[str], requested_available: bool) -> str:
+    formatted_date = _format_date(date)
+    parts = []
+    if not ranked:
+        parts.append(f"Sorry, I couldn't find a time on **{formatted_date}** that works for you and "
+                     f"{attendee_count} other attendee{'s' if attendee_count != 1 else ''}.")
+    else:
+        parts.append(f"Here are the best times on **{formatted_date}** for you and "
+                     f"{attendee_count} other attendee{'s' if attendee_count != 1 else ''}, best first:\n\n")
+        # Attendees whose calendars couldn't be read aren't part of "everyone"
+        everyone = "everyone I could check" if unknown else "everyone"
+        for start, end, unavailable in ranked:
+            who = everyone if not unavailable else f"without {', '.join(unavailable)}"
+            parts.append(f"• {start} - {end} ({who})\n")
+        if requested_time:
+            if requested_available:
+                parts.append(f"\nGood news! Your requested time ({requested_time}) works for {everyone}!")
+            else:
+                parts.append(f"\nYour requested time ({requested_time}) doesn't work for {everyone}. Please choose from the times above.")
+    if unknown:
+        parts.append(f"\n\nI couldn't see the calendars of: {', '.join(unknown)}")
+    return "".join(parts)
+
+
+track_lru_cache('render_booking', _render_booking)
+track_lru_cache('render_no_slots', _render_no_slots)
+track_lru_cache('render_slots', _render_slots)
+track_lru_cache('render_common_time', _render_common_time)